@@ -1,5 +1,13 @@
+import threading
+
 import pytest
+from django.core.cache import cache
+from django.db import connection
 
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import CategoryFactory
+from az_ecommerce.products.tests.factories import ProductFactory
 from az_ecommerce.users.models import User
 from az_ecommerce.users.tests.factories import UserFactory
 
@@ -9,6 +17,52 @@ def _media_storage(settings, tmpdir) -> None:
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def _clear_cache() -> None:
+    # Cached responses and version counters outlive the rows of a test.
+    cache.clear()
+
+
 @pytest.fixture
 def user(db) -> User:
     return UserFactory()
+
+
+@pytest.fixture
+def category(db) -> Category:
+    return CategoryFactory()
+
+
+@pytest.fixture
+def product(category) -> Product:
+    return ProductFactory(title="Shirt", quantity=100, category=category)
+
+
+@pytest.fixture
+def run_in_parallel():
+    """
+    Return a function running each of ``targets`` in its own thread, all
+    released at once, and failing if any of them raised.
+    """
+
+    def run(targets):
+        barrier = threading.Barrier(len(targets))
+        errors = []
+
+        def worker(target):
+            try:
+                barrier.wait()
+                target()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+    return run
@@ -1,16 +1,125 @@
+from functools import partial
+
 from django.contrib import admin
+from django.contrib.postgres.search import SearchQuery
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.views.decorators.csrf import csrf_exempt
+
+from az_ecommerce.products.cache import invalidate_products
+from az_ecommerce.products.managers import SEARCH_CONFIG
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Reservation
+from az_ecommerce.products.uploads import ImageUploadHandler
+from az_ecommerce.products.utils import parse_pk
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+APPROXIMATE_COUNT_THRESHOLD = 100_000
+BULK_ACTION_BATCH_SIZE = 5000
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that counts an unfiltered product table from the planner
+    statistics instead of ``COUNT(*)``, which reads the whole table. The
+    estimate is as fresh as the last ``ANALYZE``, plenty for page links.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = self.object_list.estimated_count()
+            if estimate >= APPROXIMATE_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+def update_in_batches(queryset, update):
+    """
+    Run ``update(batch)`` on the products of ``queryset``, one batch of
+    primary keys at a time, and invalidate their cached responses.
+    """
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    batch = list(pks[:BULK_ACTION_BATCH_SIZE])
+    updated = 0
+    while batch:
+        updated += update(Product.objects.filter(pk__in=batch))
+        transaction.on_commit(partial(invalidate_products, batch))
+        batch = list(pks.filter(pk__gt=batch[-1])[:BULK_ACTION_BATCH_SIZE])
+    return updated
+
 
-from az_ecommerce.products.models import (
-    Category,
-    Product,
-)
+def sell_out(batch):
+    # Units held in carts would be added back to the products when the
+    # carts are released or expire. Reservations go first, the order
+    # ``reserve()`` locks the rows in.
+    Reservation.objects.filter(product__in=batch).delete()
+    return batch.update(quantity=0)
+
+
+class ImageUploadAdminMixin:
+    """
+    Read the uploads of the add and change forms with ``ImageUploadHandler``.
+
+    The handlers must be set before anything reads the request body, the
+    CSRF middleware would, so the views are exempt from it and the check is
+    left to ``changeform_view()``, which still runs it.
+    """
+
+    @method_decorator(csrf_exempt)
+    def add_view(self, request, form_url="", extra_context=None):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().add_view(request, form_url, extra_context)
+
+    @method_decorator(csrf_exempt)
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().change_view(request, object_id, form_url, extra_context)
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ImageUploadAdminMixin, admin.ModelAdmin):
+    list_display = ("name", "parent")
+    list_select_related = ("parent",)
     search_fields = ("name",)
+    autocomplete_fields = ("parent",)
+
 
 @admin.register(Product)
-class ProductsAdmin(admin.ModelAdmin):
-    search_fields = ("name",)
+class ProductsAdmin(ImageUploadAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "title", "category", "price", "quantity", "like_count")
+    list_select_related = ("category",)
+    autocomplete_fields = ("category",)
+    # Searched through the full-text index, see get_search_results().
+    search_fields = ("title",)
+    search_help_text = "Full-text search on title, description and category, or an id."
+    paginator = ApproximateCountPaginator
+    # Skips the second, unfiltered count next to the search results.
+    show_full_result_count = False
+    actions = ("mark_out_of_stock", "refresh_search_vectors")
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        pk = parse_pk(search_term)
+        if pk is not None:
+            return queryset.filter(pk=pk), False
+        query = SearchQuery(search_term, search_type="websearch", config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query), False
+
+    @admin.action(description="Mark selected products as out of stock")
+    def mark_out_of_stock(self, request, queryset):
+        updated = update_in_batches(queryset, sell_out)
+        self.message_user(request, f"{updated} products marked as out of stock.")
 
+    @admin.action(description="Refresh the search documents of selected products")
+    def refresh_search_vectors(self, request, queryset):
+        updated = update_in_batches(
+            queryset,
+            lambda batch: batch.update_search_vector(),
+        )
+        self.message_user(request, f"{updated} search documents refreshed.")
@@ -0,0 +1,90 @@
+"""
+ETag and Last-Modified functions for ``django.views.decorators.http.condition``.
+
+All of them are computed from the version counters in ``products.cache``,
+so answering a conditional request costs a few cache reads and neither a
+database query nor a serializer run.
+"""
+
+import hashlib
+
+from az_ecommerce.products.cache import CATALOG_VERSION_KEY
+from az_ecommerce.products.cache import CATEGORY_TREE_VERSION_KEY
+from az_ecommerce.products.cache import PRODUCT_VERSION_KEY
+from az_ecommerce.products.cache import USER_FLAGS_VERSION_KEY
+from az_ecommerce.products.cache import get_last_modified
+from az_ecommerce.products.cache import get_version
+from az_ecommerce.products.cache import normalize_query
+from az_ecommerce.products.utils import parse_pk
+
+
+def make_etag(*parts):
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:40]
+
+
+def latest(*keys):
+    """
+    Return the most recent bump time of ``keys``.
+
+    Unknown times give no Last-Modified at all, clients then fall back to
+    the ETag.
+    """
+    timestamps = [get_last_modified(key) for key in keys]
+    if None in timestamps:
+        return None
+    return max(timestamps)
+
+
+def user_flags_key(request):
+    # is_liked / is_favorited make product bodies differ per user.
+    if not request.user.is_authenticated:
+        return None
+    return USER_FLAGS_VERSION_KEY.format(pk=request.user.pk)
+
+
+def product_version_key(kwargs):
+    pk = parse_pk(kwargs["pk"])
+    if pk is None:
+        return None
+    return PRODUCT_VERSION_KEY.format(pk=pk)
+
+
+def product_list_etag(request, *args, **kwargs):
+    flags_key = user_flags_key(request)
+    return make_etag(
+        get_version(CATALOG_VERSION_KEY),
+        normalize_query(request),
+        flags_key and get_version(flags_key),
+    )
+
+
+def product_list_last_modified(request, *args, **kwargs):
+    keys = [CATALOG_VERSION_KEY, user_flags_key(request)]
+    return latest(*filter(None, keys))
+
+
+def product_detail_etag(request, *args, **kwargs):
+    version_key = product_version_key(kwargs)
+    if version_key is None:
+        return None
+    flags_key = user_flags_key(request)
+    return make_etag(
+        version_key,
+        get_version(version_key),
+        flags_key and get_version(flags_key),
+    )
+
+
+def product_detail_last_modified(request, *args, **kwargs):
+    version_key = product_version_key(kwargs)
+    if version_key is None:
+        return None
+    return latest(*filter(None, [version_key, user_flags_key(request)]))
+
+
+def category_etag(request, *args, **kwargs):
+    return make_etag(get_version(CATEGORY_TREE_VERSION_KEY), normalize_query(request))
+
+
+def category_last_modified(request, *args, **kwargs):
+    return latest(CATEGORY_TREE_VERSION_KEY)
@@ -0,0 +1,66 @@
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from az_ecommerce.products.managers import SEARCH_CONFIG
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Size
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class ProductFilter(filters.FilterSet):
+    category = filters.ModelChoiceFilter(
+        queryset=Category.objects.all(),
+        method="filter_category",
+        label="Category, including all of its subcategories",
+    )
+    price_min = filters.NumberFilter(field_name="price", lookup_expr="gte")
+    price_max = filters.NumberFilter(field_name="price", lookup_expr="lte")
+    size = filters.MultipleChoiceFilter(choices=Size.choices)
+    color = CharInFilter(field_name="color", label="Comma separated colors")
+
+    class Meta:
+        model = Product
+        fields = ["category", "price_min", "price_max", "size", "color"]
+
+    def filter_category(self, queryset, name, value):
+        # A node's descendants are exactly the nodes of its tree whose
+        # (lft, rght) interval lies inside its own, so the whole subtree is
+        # one range on the category index, however deep it goes.
+        return queryset.filter(
+            category__tree_id=value.tree_id,
+            category__lft__gte=value.lft,
+            category__rght__lte=value.rght,
+        )
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Full-text search over ``Product.search_vector``.
+
+    Matches use the GIN index on the stored document and every row is
+    annotated with ``search_rank``, which the pagination uses to return
+    the most relevant products first.
+    """
+
+    search_description = "Full-text search on title, description and category."
+
+    def filter_queryset(self, request, queryset, view):
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch", config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            # ts_rank() returns a real, cast it so the value in the cursor
+            # round-trips exactly.
+            search_rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+        )
@@ -0,0 +1,275 @@
+import binascii
+import datetime
+import json
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder cuts datetimes to milliseconds, a cursor needs the
+    exact value or rows at the page edge are skipped or repeated.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a complete sort key.
+
+    Every ordering in ``orderings`` ends with a unique field (the primary
+    key), and the cursor stores the values of the whole key for the row at
+    the page edge. The next page is then a plain ``WHERE key > cursor``
+    range read from an index: no OFFSET, no COUNT(*) and no skipped or
+    repeated rows when values tie. The cursor also records the ordering it
+    was issued for, so it stays valid whatever ``?ordering=`` says.
+    """
+
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Invalid cursor"
+    # Exposed ordering name -> order_by() fields, the last one must be unique.
+    orderings = {"-id": ("-id",)}
+    default_ordering = "-id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request, queryset)
+        if cursor is None:
+            self.ordering = self.get_ordering(request, queryset, view)
+            reverse = False
+        else:
+            self.ordering, position, reverse = cursor
+
+        fields = self.orderings[self.ordering]
+        if reverse:
+            fields = tuple(self.flip(field) for field in fields)
+        queryset = queryset.order_by(*fields)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(fields, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Walking backwards we came from the page after this one, and vice
+        # versa, so that side is known to exist without another query.
+        self.has_next = cursor is not None if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            },
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Which field to use when ordering the results.",
+                "schema": {"type": "string", "enum": list(self.orderings)},
+            },
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering is None:
+            return self.get_default_ordering(queryset)
+        if not self.is_ordering_available(ordering, queryset):
+            raise ValidationError(
+                {self.ordering_query_param: [f"Choose one of {list(self.orderings)}."]},
+            )
+        return ordering
+
+    def get_default_ordering(self, queryset):
+        return self.default_ordering
+
+    def is_ordering_available(self, ordering, queryset):
+        return ordering in self.orderings
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_position_filter(self, fields, position):
+        """
+        Build ``(a, b, id) > (x, y, z)`` for the given mixed-direction key.
+
+        The first field is also bounded on its own, which lets the planner
+        turn the OR chain into an index range scan.
+        """
+        first = fields[0].lstrip("-")
+        bound = "lte" if fields[0].startswith("-") else "gte"
+        after = Q()
+        equal = {}
+        for field, value in zip(fields, position, strict=True):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            after |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return Q(**{f"{first}__{bound}": position[0]}) & after
+
+    def encode_cursor(self, instance, *, reverse):
+        fields = self.orderings[self.ordering]
+        position = [getattr(instance, field.lstrip("-")) for field in fields]
+        payload = json.dumps(
+            {"o": self.ordering, "p": position, "r": int(reverse)},
+            cls=CursorEncoder,
+            separators=(",", ":"),
+        )
+        encoded = urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(encoded + padding))
+            ordering, position, reverse = payload["o"], payload["p"], bool(payload["r"])
+        except (TypeError, ValueError, KeyError, binascii.Error) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+        if not self.is_ordering_available(ordering, queryset):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        fields = self.orderings[ordering]
+        if len(position) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self.get_key_field(queryset, field).to_python(value)
+                for field, value in zip(fields, position, strict=True)
+            ]
+        except (DjangoValidationError, TypeError, ValueError) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+        # Every field of a sort key is required.
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, position, reverse
+
+    @staticmethod
+    def get_key_field(queryset, field):
+        name = field.lstrip("-")
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)  # noqa: SLF001
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+
+class ProductPagination(KeysetPagination):
+    orderings = {
+        "-id": ("-id",),
+        "price": ("price", "id"),
+        "-price": ("-price", "-id"),
+        "title": ("title", "id"),
+        "relevance": ("-search_rank", "-id"),
+    }
+    default_ordering = "-id"
+
+    def get_default_ordering(self, queryset):
+        if self.is_ordering_available("relevance", queryset):
+            return "relevance"
+        return super().get_default_ordering(queryset)
+
+    def is_ordering_available(self, ordering, queryset):
+        # search_rank is only annotated by ProductSearchFilter.
+        if ordering == "relevance":
+            return "search_rank" in queryset.query.annotations
+        return super().is_ordering_available(ordering, queryset)
+
+
+class CategoryPagination(KeysetPagination):
+    # MPTT keeps (tree_id, lft) unique and in menu order.
+    orderings = {"tree": ("tree_id", "lft")}
+    default_ordering = "tree"
+    page_size = 100
+    max_page_size = 500
+
+
+class FavoritePagination(KeysetPagination):
+    orderings = {"-id": ("-id",)}
+    default_ordering = "-id"
+
+
+class OrderPagination(KeysetPagination):
+    orderings = {"-id": ("-id",)}
+    default_ordering = "-id"
+
+
+class ReviewPagination(KeysetPagination):
+    # Matches the partial index rating_product_review_idx.
+    orderings = {"-created_at": ("-created_at", "-id")}
+    default_ordering = "-created_at"
+    page_size = 20
@@ -1,26 +1,48 @@
-from idna import valid_contextj
-from requests import delete
 from rest_framework import serializers
 
-from az_ecommerce.products.models import (
-    Cart,
-    CartItem,
-    Category,
-    Product,
-    Like,
-    Favorites,
-    Rating,
-)
+from az_ecommerce.products.carts import ADD
+from az_ecommerce.products.carts import REMOVE
+from az_ecommerce.products.carts import SET
+from az_ecommerce.products.carts import collapse_operations
+from az_ecommerce.products.carts import get_cart_store
+from az_ecommerce.products.images import image_srcset
+from az_ecommerce.products.inventory import OutOfStockError
+from az_ecommerce.products.inventory import release
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Order
+from az_ecommerce.products.models import OrderItem
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+from az_ecommerce.products.utils import get_user_product_flags
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """``{format: srcset}`` of the resized copies of the instance's image."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return image_srcset(value.image.storage, value.image.name, value.image_variants)
 
 
 class CategorySerializer(serializers.ModelSerializer):
     parent_name = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Category
         fields = [
+            "id",
             "name",
             "image",
+            "image_srcset",
             "parent",
             "parent_name",
         ]
@@ -29,28 +51,65 @@ class CategorySerializer(serializers.ModelSerializer):
         return obj.parent.name if obj.parent else None
 
 
+class ProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Resolve the user's likes and favorites for the whole page at once,
+        # the child serializer then only does set lookups.
+        products = list(data.all() if hasattr(data, "all") else data)
+        if self.context.get("include_user_flags", True):
+            self.context.update(
+                get_user_product_flags(
+                    self.context["request"].user,
+                    [product.pk for product in products],
+                ),
+            )
+        return super().to_representation(products)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     avg_rate = serializers.SerializerMethodField()
     tot_rate = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Product
+        list_serializer_class = ProductListSerializer
         fields = [
+            "id",
             "title",
             "description",
             "price",
             "image",
+            "image_srcset",
             "size",
             "color",
             "quantity",
             "avg_rate",
             "tot_rate",
+            "like_count",
             "is_favorited",
-            "is_liked"
+            "is_liked",
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # Bodies shared between users through the response cache leave the
+        # per-user fields out, see ``apply_user_product_flags``.
+        if not self.context.get("include_user_flags", True):
+            fields.pop("is_favorited")
+            fields.pop("is_liked")
+        return fields
+
+    def to_representation(self, instance):
+        include_flags = self.context.get("include_user_flags", True)
+        if include_flags and "liked_ids" not in self.context:
+            self.context.update(
+                get_user_product_flags(self.context["request"].user, [instance.pk]),
+            )
+        return super().to_representation(instance)
+
     def get_avg_rate(self, obj):
         return obj.avg_rate()
 
@@ -58,37 +117,73 @@ class ProductSerializer(serializers.ModelSerializer):
         return obj.tot_rating()
 
     def get_is_favorited(self, obj):
-        user = self.context.get("request").user
-        return Favorites.objects.filter(user=user, product=obj).exists()
-    
+        return obj.pk in self.context["favorited_ids"]
+
     def get_is_liked(self, obj):
-        user =self.context["request"].user
-        return Like.objects.filter(user=user, product=obj)
-    
+        return obj.pk in self.context["liked_ids"]
+
     def like_product(self, product):
-        user = self.context['request'].user
-        like, created = Like.objects.get_or_create(user=user, product=product)
-        favorite, _  = Favorites.objects.get_or_create(user=user, product=product)
+        user = self.context["request"].user
+        created = Like.objects.add(user, product)
+        Favorites.objects.add(user, product)
+
+        return created
 
-        return like, created
-    
     def unlike_product(self, product):
         user = self.context["request"].user
-        Like.objects.filter(user=user, product=product).delete()
-        Favorites.objects.filter(user=user, product=product).delete()
+        Like.objects.remove(user, product)
+        Favorites.objects.remove(user, product)
 
         return {"message": "unliked product and removed it from favorites"}
-        
-    def update(self, instance, validated_data):
-        instance = super().update(instance, validated_data)
 
-        like = self.context['like']
-        if like and like == 'like':
-            self.like_product(instance)
-        
-        return instance
+
+class ProductBulkActionSerializer(serializers.Serializer):
+    LIKE = "like"
+    UNLIKE = "unlike"
+    FAVORITE = "favorite"
+    UNFAVORITE = "unfavorite"
+
+    operation = serializers.ChoiceField(choices=[LIKE, UNLIKE, FAVORITE, UNFAVORITE])
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_product_ids(self, value):
+        products = Product.objects.only("id").in_bulk(set(value))
+        missing = sorted(set(value) - products.keys())
+        if missing:
+            msg = f"Invalid product ids: {missing}"
+            raise serializers.ValidationError(msg)
+        self.products = list(products.values())
+        return value
+
+    def apply(self):
+        """
+        Apply the operation to every product and return the resulting
+        liked and favorited ids among them.
+        """
+        user = self.context["request"].user
+        operation = self.validated_data["operation"]
+        # Like and unlike also favorite and unfavorite, as the single
+        # product endpoint does.
+        if operation == self.LIKE:
+            Like.objects.bulk_add(user, self.products)
+        if operation == self.UNLIKE:
+            Like.objects.bulk_remove(user, self.products)
+        if operation in (self.LIKE, self.FAVORITE):
+            Favorites.objects.bulk_add(user, self.products)
+        if operation in (self.UNLIKE, self.UNFAVORITE):
+            Favorites.objects.bulk_remove(user, self.products)
+
+        flags = get_user_product_flags(user, self.validated_data["product_ids"])
+        return {key: sorted(ids) for key, ids in flags.items()}
+
 
 class ProductRetriveSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Product
         fields = [
@@ -96,23 +191,55 @@ class ProductRetriveSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "image",
+            "image_srcset",
             "size",
             "color",
             "quantity",
         ]
 
+
+class ReviewSerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source="user.name", read_only=True)
+
+    class Meta:
+        model = Rating
+        fields = [
+            "id",
+            "user",
+            "score",
+            "review",
+            "created_at",
+        ]
+
+
+class RatingSummarySerializer(serializers.ModelSerializer):
+    count = serializers.IntegerField(source="rating_count")
+    average = serializers.FloatField(source="avg_rate")
+    histogram = serializers.DictField(source="rating_histogram")
+
+    class Meta:
+        model = Product
+        fields = [
+            "count",
+            "average",
+            "histogram",
+        ]
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     product = ProductRetriveSerializer()
+
     class Meta:
         model = Favorites
         fields = [
+            "id",
             "product",
-            "user",
         ]
 
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductRetriveSerializer()
+
     class Meta:
         model = CartItem
         fields = [
@@ -121,56 +248,131 @@ class CartItemSerializer(serializers.ModelSerializer):
             "tot_price",
         ]
 
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
+    # Annotated by ``Cart.objects.with_totals()``.
+    item_count = serializers.IntegerField(read_only=True)
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Cart
         fields = [
-            "items"
+            "items",
+            "item_count",
+            "subtotal",
         ]
 
+
 class AddToCartSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1, default=1)
 
     def validate(self, attrs):
         try:
-            product = Product.objects.get(id=attrs["product_id"])
-        except product.DoesNotExist:
-            return serializers.ValidationError({"message": "product not found"})
-        
+            product = Product.objects.only("id").get(id=attrs["product_id"])
+        except Product.DoesNotExist:
+            msg = {"message": "product not found"}
+            raise serializers.ValidationError(msg) from None
+
         attrs["product"] = product
         return attrs
-    
+
     def save(self, **kwargs):
         user = self.context["request"].user
-        cart,_  = Cart.objects.get_or_create(user=user)
-        product = self.validated_data["product_id"]
+        product = self.validated_data["product"]
         quantity = self.validated_data["quantity"]
+        try:
+            reserve(user, deltas={product.pk: quantity})
+        except OutOfStockError:
+            raise serializers.ValidationError({"message": "not enough stock"}) from None
+        return get_cart_store().add(user, product, quantity)
+
 
-        item , created = CartItem.objects.get_or_create(cart=cart, product_id=product, quantity=quantity)
-        if not created:
-            item.quantity += quantity
-        
-        item.save()
-    
 class RemoveItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
 
-    def validate(self, attrs):
+    def save(self, **kwargs):
         user = self.context["request"].user
-        cart = Cart.objects.filter(user=user).first()
-        if not cart:
-            raise serializers.ValidationError({"message": "cart is empty"})
-        product_id = attrs["product_id"]
-        item = CartItem.objects.filter(cart=cart, product_id=product_id)
-        if not item:
+        product_id = self.validated_data["product_id"]
+        if not get_cart_store().remove(user, product_id):
             raise serializers.ValidationError({"message": "there is no item to delete"})
-        
-        attrs["item"] = item
+        release(user, [product_id])
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=[ADD, SET, REMOVE])
+    product_id = serializers.IntegerField()
+    # Setting a quantity of 0 removes the product.
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] == REMOVE:
+            attrs["quantity"] = 0
+        elif "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": "This field is required."})
+        elif attrs["op"] == ADD and attrs["quantity"] < 1:
+            raise serializers.ValidationError(
+                {"quantity": "Ensure this value is greater than or equal to 1."},
+            )
         return attrs
-    
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_operations(self, value):
+        product_ids = {
+            operation["product_id"] for operation in value if operation["op"] != REMOVE
+        }
+        existing = Product.objects.filter(pk__in=product_ids).values_list(
+            "pk",
+            flat=True,
+        )
+        missing = sorted(product_ids - set(existing))
+        if missing:
+            msg = f"Invalid product ids: {missing}"
+            raise serializers.ValidationError(msg)
+        return value
+
     def save(self, **kwargs):
-        item = self.validated_data["item"]
-        item.delete()
\ No newline at end of file
+        user = self.context["request"].user
+        operations = [
+            (operation["op"], operation["product_id"], operation["quantity"])
+            for operation in self.validated_data["operations"]
+        ]
+        deltas, quantities, removed = collapse_operations(operations)
+        try:
+            reserve(user, deltas, quantities | dict.fromkeys(removed, 0))
+        except OutOfStockError as e:
+            raise serializers.ValidationError(
+                {"message": f"not enough stock for products {e.product_ids}"},
+            ) from None
+        get_cart_store().apply(user, operations)
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = [
+            "product",
+            "title",
+            "price",
+            "quantity",
+            "line_total",
+        ]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "status",
+            "total",
+            "created_at",
+            "items",
+        ]
+        read_only_fields = ["status", "total", "created_at"]
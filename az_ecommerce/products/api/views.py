@@ -1,3 +1,10 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.mixins import (
@@ -6,98 +13,352 @@ from rest_framework.mixins import (
     DestroyModelMixin,
     RetrieveModelMixin,
 )
+from rest_framework.generics import get_object_or_404
 from rest_framework.viewsets import GenericViewSet
+from rest_framework.permissions import IsAdminUser
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
 from rest_framework.decorators import action
 
+from az_ecommerce.products.api.conditions import category_etag
+from az_ecommerce.products.api.conditions import category_last_modified
+from az_ecommerce.products.api.conditions import product_detail_etag
+from az_ecommerce.products.api.conditions import product_detail_last_modified
+from az_ecommerce.products.api.conditions import product_list_etag
+from az_ecommerce.products.api.conditions import product_list_last_modified
+from az_ecommerce.products.api.filters import ProductFilter
+from az_ecommerce.products.api.filters import ProductSearchFilter
+from az_ecommerce.products.api.pagination import CategoryPagination
+from az_ecommerce.products.api.pagination import FavoritePagination
+from az_ecommerce.products.api.pagination import OrderPagination
+from az_ecommerce.products.api.pagination import ProductPagination
+from az_ecommerce.products.api.pagination import ReviewPagination
 from az_ecommerce.products.api.serializers import (
     AddToCartSerializer,
+    CartBatchSerializer,
     CartSerializer,
     CategorySerializer,
     FavoriteSerializer,
-    ProductRetriveSerializer,
+    OrderSerializer,
+    ProductBulkActionSerializer,
     ProductSerializer,
+    RatingSummarySerializer,
     RemoveItemSerializer,
+    ReviewSerializer,
 )
 
 from az_ecommerce.products.models import (
     Cart,
-    CartItem,
     Category,
     Favorites,
+    Order,
     Product,
+    Rating,
+)
+from az_ecommerce.products.cache import PRODUCT_RESPONSE_TIMEOUT
+from az_ecommerce.products.cache import product_detail_cache_key
+from az_ecommerce.products.cache import product_facets_cache_key
+from az_ecommerce.products.cache import product_list_cache_key
+from az_ecommerce.products.carts import get_cart_store
+from az_ecommerce.products.exports import EXPORT_FORMATS
+from az_ecommerce.products.exports import EXPORTS
+from az_ecommerce.products.exports import export
+from az_ecommerce.products.inventory import OutOfStockError
+from az_ecommerce.products.inventory import release
+from az_ecommerce.products.managers import STAR_COUNT_FIELDS
+from az_ecommerce.products.orders import EmptyCartError
+from az_ecommerce.products.orders import IdempotencyKeyReusedError
+from az_ecommerce.products.orders import place_order
+from az_ecommerce.products.utils import apply_user_product_flags
+from az_ecommerce.products.utils import get_category_tree
+from az_ecommerce.products.utils import parse_pk
+
+
+category_condition = condition(
+    etag_func=category_etag,
+    last_modified_func=category_last_modified,
 )
 
 
+@method_decorator(category_condition, name="list")
+@method_decorator(category_condition, name="retrieve")
+@method_decorator(category_condition, name="tree")
 class CategoryViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
-    queryset = Category.objects.all()
+    queryset = Category.objects.select_related("parent")
     serializer_class = CategorySerializer
+    pagination_class = CategoryPagination
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def tree(self, request):
+        return Response(get_category_tree())
 
 class ProductViewSet(ListModelMixin, RetrieveModelMixin,GenericViewSet):
     queryset = Product.objects.all()
-    serializer_class = ProductRetriveSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    filterset_fields = ['category']
-    search_fields = ['title']
-    
+    serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter]
+    filterset_class = ProductFilter
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            # These bodies are cached and shared between users, the
+            # per-user flags are layered over them in list() and retrieve().
+            context["include_user_flags"] = False
+        return context
+
+    @method_decorator(
+        condition(
+            etag_func=product_list_etag,
+            last_modified_func=product_list_last_modified,
+        ),
+    )
+    def list(self, request, *args, **kwargs):
+        key = product_list_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            data = self.get_paginated_response(serializer.data).data
+            data["facets"] = self.get_facets(request, queryset)
+            cache.set(key, data, PRODUCT_RESPONSE_TIMEOUT)
+        results = apply_user_product_flags(request.user, data["results"])
+        return Response({**data, "results": results})
+
+    def get_facets(self, request, queryset):
+        key = product_facets_cache_key(request)
+        facets = cache.get(key)
+        if facets is None:
+            facets = queryset.facet_counts()
+            cache.set(key, facets, PRODUCT_RESPONSE_TIMEOUT)
+        return facets
+
+    @method_decorator(
+        condition(
+            etag_func=product_detail_etag,
+            last_modified_func=product_detail_last_modified,
+        ),
+    )
+    def retrieve(self, request, *args, **kwargs):
+        pk = parse_pk(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if pk is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        key = product_detail_cache_key(pk)
+        data = cache.get(key)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(key, data, PRODUCT_RESPONSE_TIMEOUT)
+        return Response(apply_user_product_flags(request.user, [data])[0])
+
     @action(
         detail=True,
-        methods=["get"],
+        methods=["post", "delete"],
         permission_classes=[IsAuthenticated],
         serializer_class=ProductSerializer,
         url_path="like"
     )
     def like_product(self, request, pk=None):
         product = self.get_object()
-        serializer = self.get_serializer(instance=product, context={"request":request})
-        serializer.like_product(product)
-        return Response(status=status.HTTP_201_CREATED)
-    
+        serializer = self.get_serializer(instance=product)
+        if request.method == "DELETE":
+            serializer.unlike_product(product)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        created = serializer.like_product(product)
+        return Response(
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
     @action(
         detail=True,
         methods=["get"],
+        pagination_class=ReviewPagination,
+        serializer_class=ReviewSerializer,
+        filter_backends=[],
+    )
+    def reviews(self, request, pk=None):
+        """
+        Written reviews of the product, newest first, under the summary of
+        all its ratings.
+        """
+        product = get_object_or_404(
+            Product.objects.only(
+                "rating_count",
+                "rating_avg",
+                *STAR_COUNT_FIELDS.values(),
+            ),
+            pk=pk,
+        )
+        # Reviews without text are left out, as by the partial index.
+        reviews = (
+            Rating.objects.filter(product=product)
+            .exclude(review="")
+            .select_related("user")
+            .only("id", "score", "review", "created_at", "user__name")
+        )
+        page = self.paginate_queryset(reviews)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data = {
+            "summary": RatingSummarySerializer(product).data,
+            **response.data,
+        }
+        return response
+
+    @action(
+        detail=False,
+        methods=["post"],
         permission_classes=[IsAuthenticated],
-        serializer_class=ProductSerializer,
-        url_path="unlike"
+        serializer_class=ProductBulkActionSerializer,
+        url_path="bulk",
     )
-    def unlike_product(self, request, pk=None):
-        product = self.get_object()
-        serializer = self.get_serializer(instance=product, context={"request":request})
-        serializer.unlike_product(product)
-        return Response(status=status.HTTP_200_OK)
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.apply(), status=status.HTTP_200_OK)
 
 class FavoritesViewSet(ListModelMixin, GenericViewSet):
     queryset = Favorites.objects.all()
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FavoritePagination
 
     def get_queryset(self):
-        return Favorites.objects.filter(user=self.request.user)
+        return Favorites.objects.filter(user=self.request.user).select_related(
+            "product",
+        )
 
+# Outside the request transaction, so the product rows ``reserve()`` locks
+# are released when its own transaction commits, before the cart is
+# written. A hold whose cart write fails expires with the others.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class CartViewSet(ListModelMixin, DestroyModelMixin, CreateModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Cart.objects.filter(user=user)
+        return Cart.objects.filter(user=user).with_totals()
+
+    def list(self, request, *args, **kwargs):
+        # A cart kept in Redis is written through before it is read.
+        get_cart_store().flush(request.user)
+        return super().list(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        get_cart_store().clear(self.request.user)
+        release(self.request.user)
+        instance.delete()
     
     def get_serializer_class(self):
         if self.action == "create":
             return AddToCartSerializer
         if self.action == "remove_item":
             return RemoveItemSerializer
+        if self.action == "batch":
+            return CartBatchSerializer
         return CartSerializer
-    
+
     @action(
-        detail=True,
+        detail=False,
         methods=["post"],
         url_path="remove-item",
     )
     def remove_item(self, request):
         serializer = self.get_serializer(data = request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save
+        serializer.save()
         return Response(status=status.HTTP_200_OK)
 
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="batch",
+    )
+    def batch(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        get_cart_store().flush(request.user)
+        cart = self.get_queryset().get()
+        context = self.get_serializer_context()
+        return Response(CartSerializer(cart, context=context).data)
+
+
+class OrderViewSet(
+    ListModelMixin,
+    RetrieveModelMixin,
+    CreateModelMixin,
+    GenericViewSet,
+):
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user).prefetch_related("items")
+
+    def create(self, request, *args, **kwargs):
+        """
+        Place an order for the cart.
+
+        Clients should send an ``Idempotency-Key`` header, a retry with the
+        same key returns the order placed the first time.
+        """
+        key = request.headers.get("Idempotency-Key", "")
+        if len(key) > Order._meta.get_field("idempotency_key").max_length:  # noqa: SLF001
+            return Response(
+                {"message": "Idempotency-Key is too long"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            order, created = place_order(
+                request.user,
+                idempotency_key=key,
+                request_hash=hashlib.sha256(request.body).hexdigest() if key else "",
+            )
+        except IdempotencyKeyReusedError:
+            return Response(
+                {"message": "Idempotency-Key was already used for another request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        except EmptyCartError:
+            return Response(
+                {"message": "cart is empty"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except OutOfStockError as e:
+            return Response(
+                {"message": f"not enough stock for products {e.product_ids}"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        serializer = self.get_serializer(order)
+        headers = {} if created else {"Idempotent-Replayed": "true"}
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED,
+            headers=headers,
+        )
+
+
+# e.g. exports/products/csv/
+EXPORT_URL_PATH = (
+    rf"(?P<name>{'|'.join(EXPORTS)})/(?P<file_format>{'|'.join(EXPORT_FORMATS)})"
+)
+
+
+class ExportViewSet(GenericViewSet):
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, url_path=EXPORT_URL_PATH)
+    def download(self, request, name, file_format):
+        response = StreamingHttpResponse(
+            export(name, file_format),
+            content_type=EXPORT_FORMATS[file_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{name}.{file_format}"'
+        return response
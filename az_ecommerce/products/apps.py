@@ -0,0 +1,13 @@
+import contextlib
+
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class ProductsConfig(AppConfig):
+    name = "az_ecommerce.products"
+    verbose_name = _("Products")
+
+    def ready(self):
+        with contextlib.suppress(ImportError):
+            import az_ecommerce.products.signals  # noqa: F401
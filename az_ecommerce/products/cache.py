@@ -0,0 +1,128 @@
+import hashlib
+import time
+from datetime import UTC
+from datetime import datetime
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+CATEGORY_TREE_VERSION_KEY = "products:category-tree:version"
+CATEGORY_TREE_KEY = "products:category-tree:{version}"
+
+# Bumped by every change that can alter a product list page, while each
+# product has its own version for its detail response.
+CATALOG_VERSION_KEY = "products:catalog:version"
+PRODUCT_VERSION_KEY = "products:product:{pk}:version"
+PRODUCT_LIST_KEY = "products:list:{version}:{query}"
+PRODUCT_DETAIL_KEY = "products:detail:{pk}:{version}"
+PRODUCT_FACETS_KEY = "products:facets:{version}:{query}"
+# Parameters that only pick a page, facets are shared by all pages.
+PAGE_PARAMS = {"cursor", "page_size", "ordering"}
+# Entries of old versions are never read again, this only bounds how long
+# they take up memory.
+PRODUCT_RESPONSE_TIMEOUT = 60 * 60
+
+# Counters may expire, see get_version(). This keeps versions of ids
+# nobody asks for anymore from piling up.
+VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+# Bumped when a user likes, unlikes, favorites or unfavorites something.
+USER_FLAGS_VERSION_KEY = "products:user:{pk}:flags:version"
+
+
+def get_redis():
+    """Return a raw client for the Redis server behind the default cache."""
+    return get_redis_connection("default")
+
+
+def get_version(key):
+    """
+    Return the current value of a version counter stored in the cache.
+
+    Counters start from the current time in nanoseconds rather than 1, so a
+    counter that expired or was evicted never comes back with a value it
+    had before and cannot resurrect entries cached under an old version.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=VERSION_TIMEOUT)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_version(key):
+    """Move a version counter forward, orphaning everything cached under it."""
+    cache.set(f"{key}:modified", time.time(), timeout=VERSION_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=VERSION_TIMEOUT)
+        return version
+
+
+def get_last_modified(key):
+    """Return when a version counter was last bumped, if that is known."""
+    timestamp = cache.get(f"{key}:modified")
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=UTC)
+
+
+def normalize_query(request, exclude=()):
+    """
+    Digest the URL of ``request`` independently of parameter order.
+
+    Empty parameters are dropped and repeated ones sorted, so equivalent
+    filter, search and cursor combinations share one cache entry.
+    """
+    params = sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in request.query_params.lists()
+        if key not in exclude
+    )
+    params = [(key, values) for key, values in params if values]
+    raw = f"{request.build_absolute_uri(request.path)}?{params!r}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def product_list_cache_key(request):
+    return PRODUCT_LIST_KEY.format(
+        version=get_version(CATALOG_VERSION_KEY),
+        query=normalize_query(request),
+    )
+
+
+def product_facets_cache_key(request):
+    return PRODUCT_FACETS_KEY.format(
+        version=get_version(CATALOG_VERSION_KEY),
+        query=normalize_query(request, exclude=PAGE_PARAMS),
+    )
+
+
+def product_detail_cache_key(pk):
+    version = get_version(PRODUCT_VERSION_KEY.format(pk=pk))
+    return PRODUCT_DETAIL_KEY.format(pk=pk, version=version)
+
+
+def invalidate_catalog():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_product(pk):
+    invalidate_products([pk])
+
+
+def invalidate_products(pks):
+    invalidate_product_details(pks)
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_product_details(pks):
+    """Orphan the detail responses of ``pks`` but keep the list pages."""
+    for pk in pks:
+        bump_version(PRODUCT_VERSION_KEY.format(pk=pk))
+
+
+def invalidate_user_flags(user_pk):
+    bump_version(USER_FLAGS_VERSION_KEY.format(pk=user_pk))
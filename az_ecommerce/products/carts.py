@@ -0,0 +1,298 @@
+"""
+Cart storage.
+
+With ``CART_STORAGE = "database"`` every cart change is written to
+``Cart``/``CartItem`` straight away. With ``"redis"`` an active cart lives in
+a Redis hash of product id -> quantity that is changed with atomic hash
+commands, and the carts changed since the last run are written to the
+database in batches by ``manage.py flush_carts``. A cart is also written
+through before it is read and at checkout, so the database copy is current
+whenever it matters.
+"""
+
+import functools
+import operator
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from az_ecommerce.products.cache import get_redis
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.models import Product
+
+CART_KEY = "carts:{user_id}:items"
+DIRTY_CARTS_KEY = "carts:dirty"
+# Set once the database items were copied into the hash.
+LOADED_FIELD = "loaded"
+CART_TIMEOUT = 60 * 60 * 24 * 30
+
+ADD = "add"
+SET = "set"
+REMOVE = "remove"
+
+
+def collapse_operations(operations):
+    """
+    Reduce ``(op, product_id, quantity)`` operations, applied in order, to
+    one change per product.
+
+    Return ``(deltas, quantities, removed)``: the quantities to add to the
+    products already in the cart, the quantities to set and the products
+    to remove.
+    """
+    changes = {}
+    for op, product_id, quantity in operations:
+        kind, value = changes.get(product_id, (ADD, 0))
+        if op == ADD:
+            changes[product_id] = (SET if kind == REMOVE else kind, value + quantity)
+        elif op == SET and quantity > 0:
+            changes[product_id] = (SET, quantity)
+        else:
+            changes[product_id] = (REMOVE, 0)
+
+    deltas, quantities, removed = {}, {}, set()
+    for product_id, (kind, value) in changes.items():
+        if kind == ADD:
+            deltas[product_id] = value
+        elif kind == SET:
+            quantities[product_id] = value
+        else:
+            removed.add(product_id)
+    return deltas, quantities, removed
+
+
+class DatabaseCartStore:
+    def add(self, user, product, quantity):
+        """Add ``quantity`` of ``product`` and return the quantity now in the cart."""
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return CartItem.objects.add(cart, product, quantity)
+
+    def remove(self, user, product_id):
+        """Remove the product from the cart and return whether it was there."""
+        deleted, _ = CartItem.objects.filter(
+            cart__user=user,
+            product_id=product_id,
+        ).delete()
+        return bool(deleted)
+
+    def apply(self, user, operations):
+        """
+        Apply ``(op, product_id, quantity)`` operations in one transaction,
+        with one statement per kind of change.
+        """
+        deltas, quantities, removed = collapse_operations(operations)
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=user)
+            if removed:
+                CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+            if quantities:
+                CartItem.objects.bulk_create(
+                    [
+                        CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                        for product_id, quantity in sorted(quantities.items())
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["cart", "product"],
+                    update_fields=["quantity"],
+                )
+            if deltas:
+                CartItem.objects.bulk_add(cart, deltas)
+
+    def clear(self, user):
+        CartItem.objects.filter(cart__user=user).delete()
+
+    def flush(self, user):
+        """Write the user's pending changes to the database."""
+
+    def flush_all(self, batch_size=500):
+        """Write the pending changes of every cart, return how many were written."""
+        return 0
+
+
+class RedisCartStore(DatabaseCartStore):
+    def __init__(self, redis=None):
+        self.redis = redis if redis is not None else get_redis()
+
+    def add(self, user, product, quantity):
+        key = self.load(user)
+        with self.redis.pipeline() as pipe:
+            pipe.hincrby(key, product.pk, quantity)
+            pipe.expire(key, CART_TIMEOUT)
+            pipe.sadd(DIRTY_CARTS_KEY, user.pk)
+            total, *_ = pipe.execute()
+        return total
+
+    def remove(self, user, product_id):
+        key = self.load(user)
+        with self.redis.pipeline() as pipe:
+            pipe.hdel(key, product_id)
+            pipe.sadd(DIRTY_CARTS_KEY, user.pk)
+            removed, _ = pipe.execute()
+        return bool(removed)
+
+    def apply(self, user, operations):
+        deltas, quantities, removed = collapse_operations(operations)
+        key = self.load(user)
+        # A MULTI/EXEC pipeline, so the whole batch is applied at once.
+        with self.redis.pipeline() as pipe:
+            if removed:
+                pipe.hdel(key, *removed)
+            if quantities:
+                pipe.hset(key, mapping=quantities)
+            for product_id, delta in deltas.items():
+                pipe.hincrby(key, product_id, delta)
+            pipe.expire(key, CART_TIMEOUT)
+            pipe.sadd(DIRTY_CARTS_KEY, user.pk)
+            pipe.execute()
+
+    def clear(self, user):
+        with self.redis.pipeline() as pipe:
+            pipe.delete(CART_KEY.format(user_id=user.pk))
+            pipe.srem(DIRTY_CARTS_KEY, user.pk)
+            pipe.execute()
+        super().clear(user)
+
+    def items(self, user):
+        """Return the cart as ``{product_id: quantity}``."""
+        return self.parse(self.redis.hgetall(self.load(user))) or {}
+
+    def load(self, user):
+        """
+        Copy the database items into the user's hash unless they already
+        are there, and return the key of the hash.
+
+        The items are written with the loaded marker in one MULTI/EXEC
+        under WATCH, so nothing changes the hash before it is filled. When
+        two callers race, the one that loses sees the marker on its retry.
+        """
+        key = CART_KEY.format(user_id=user.pk)
+        if self.redis.hexists(key, LOADED_FIELD):
+            return key
+        items = dict(
+            CartItem.objects.filter(cart__user=user).values_list(
+                "product_id",
+                "quantity",
+            ),
+        )
+
+        def fill(pipe):
+            if pipe.hexists(key, LOADED_FIELD):
+                return
+            pipe.multi()
+            pipe.hset(key, mapping={LOADED_FIELD: 1, **items})
+            pipe.expire(key, CART_TIMEOUT)
+
+        self.redis.transaction(fill, key)
+        return key
+
+    def flush(self, user):
+        if self.redis.srem(DIRTY_CARTS_KEY, user.pk):
+            self.persist([user.pk])
+
+    def flush_all(self, batch_size=500):
+        flushed = 0
+        while user_ids := self.redis.spop(DIRTY_CARTS_KEY, batch_size):
+            self.persist([int(user_id) for user_id in user_ids])
+            flushed += len(user_ids)
+        return flushed
+
+    def persist(self, user_ids):
+        """
+        Write the hashes of ``user_ids`` over their database carts.
+
+        The users are marked dirty again when the write fails, so the next
+        flush retries them.
+        """
+        try:
+            self.write(user_ids)
+        except Exception:
+            self.redis.sadd(DIRTY_CARTS_KEY, *user_ids)
+            raise
+
+    def write(self, user_ids):
+        with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(CART_KEY.format(user_id=user_id))
+            contents = {
+                user_id: items
+                for user_id, raw in zip(user_ids, pipe.execute(), strict=True)
+                # An expired hash says nothing about the cart, keep the rows.
+                if (items := self.parse(raw)) is not None
+            }
+        # Users deleted since their last change have no cart to write to.
+        users = set(
+            get_user_model()
+            .objects.filter(pk__in=contents)
+            .values_list("pk", flat=True),
+        )
+        contents = {
+            user_id: items for user_id, items in contents.items() if user_id in users
+        }
+        if not contents:
+            return
+
+        product_ids = {
+            product_id for items in contents.values() for product_id in items
+        }
+        existing = set(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True),
+        )
+        with transaction.atomic():
+            Cart.objects.bulk_create(
+                [Cart(user_id=user_id) for user_id in contents],
+                ignore_conflicts=True,
+            )
+            carts = dict(
+                Cart.objects.filter(user_id__in=contents).values_list("user_id", "pk"),
+            )
+            CartItem.objects.filter(
+                functools.reduce(
+                    operator.or_,
+                    (
+                        Q(cart_id=carts[user_id]) & ~Q(product_id__in=items)
+                        for user_id, items in contents.items()
+                    ),
+                ),
+            ).delete()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart_id=carts[user_id],
+                        product_id=product_id,
+                        quantity=quantity,
+                    )
+                    for user_id, items in contents.items()
+                    for product_id, quantity in items.items()
+                    if product_id in existing
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity"],
+            )
+
+    @staticmethod
+    def parse(raw):
+        """
+        Turn a raw hash into ``{product_id: quantity}``, or None when it was
+        never loaded.
+        """
+        items = {
+            (key.decode() if isinstance(key, bytes) else key): int(value)
+            for key, value in raw.items()
+        }
+        if items.pop(LOADED_FIELD, None) is None:
+            return None
+        return {
+            int(product_id): quantity
+            for product_id, quantity in items.items()
+            if quantity > 0
+        }
+
+
+def get_cart_store():
+    if settings.CART_STORAGE == "redis":
+        return RedisCartStore()
+    return DatabaseCartStore()
@@ -0,0 +1,189 @@
+"""
+Bulk catalog import.
+
+Products are read one row at a time from a CSV file with a header row or a
+JSON lines file, and loaded with ``COPY`` in batches that commit on their
+own. A row names its category by its path from the root, e.g.
+``"Men > Shirts"`` (or a JSON list of names), resolved against a map of
+every category path that is read once. Missing categories are created per
+batch with MPTT updates delayed to one partial rebuild. The progress of an
+import is saved with every batch, in the same transaction. Only the map and
+one batch are ever held in memory, whatever the size of the file.
+"""
+
+import csv
+import json
+from decimal import Decimal
+from decimal import InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from az_ecommerce.products.cache import invalidate_catalog
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+CATEGORY_SEPARATOR = ">"
+# Fields read from the file, the rest keep their defaults.
+IMPORTED_FIELDS = {"title", "description", "price", "size", "color", "quantity"}
+
+
+NOT_VALIDATED_FIELDS = [
+    field.name
+    for field in Product._meta.fields  # noqa: SLF001
+    if field.name not in IMPORTED_FIELDS
+]
+
+
+def read_rows(path):
+    """
+    Yield the rows of a ``.csv`` file as dicts, or the lines of a
+    ``.jsonl``/``.ndjson`` file, which are decoded with the rest of the row
+    so that a malformed line is reported like any other bad row.
+    """
+    path = Path(path)
+    with path.open(encoding="utf-8-sig", newline="") as file:
+        if path.suffix == ".csv":
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def load_row(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        msg = "row is not a JSON object"
+        raise TypeError(msg)
+    return row
+
+
+def load_category_paths():
+    """Return ``{(name, ..., name): category id}`` for every category."""
+    paths = {}
+    ids = {}
+    rows = Category.objects.order_by("tree_id", "lft").values_list(
+        "id",
+        "name",
+        "parent_id",
+    )
+    for pk, name, parent_id in rows:
+        ids[pk] = (*ids.get(parent_id, ()), name)
+        paths[ids[pk]] = pk
+    return paths
+
+
+def category_path(value):
+    names = value if isinstance(value, list) else str(value).split(CATEGORY_SEPARATOR)
+    return tuple(name.strip() for name in names if name.strip())
+
+
+def create_categories(paths, missing):
+    """Create the ``missing`` category paths and add them to ``paths``."""
+    with Category.objects.delay_mptt_updates():
+        for path in sorted(missing, key=len):
+            for depth in range(1, len(path) + 1):
+                if path[:depth] not in paths:
+                    paths[path[:depth]] = Category.objects.create(
+                        name=path[depth - 1],
+                        parent_id=paths.get(path[: depth - 1]),
+                    ).pk
+
+
+def build_product(row):
+    product = Product(
+        title=row["title"],
+        description=row.get("description") or "",
+        price=Decimal(str(row["price"])),
+        size=row.get("size") or "",
+        image=row.get("image") or "",
+        color=row.get("color") or "",
+        quantity=int(row.get("quantity") or 0),
+    )
+    # The category is checked against the map, the image is already stored.
+    product.clean_fields(exclude=NOT_VALIDATED_FIELDS)
+    return product
+
+
+def parse_rows(batch):
+    """
+    Build the products of ``(row number, row)`` pairs, return them as
+    ``(row number, category path, product)`` and the rows that could not
+    be read as ``(row number, message)``.
+    """
+    products = []
+    errors = []
+    for number, line in batch:
+        try:
+            row = load_row(line)
+            product = build_product(row)
+            path = category_path(row["category"])
+        except json.JSONDecodeError as e:
+            errors.append((number, f"not valid JSON: {e.msg}"))
+        except TypeError as e:
+            errors.append((number, str(e)))
+        except KeyError as e:
+            errors.append((number, f"{e.args[0]} is missing"))
+        except ValidationError as e:
+            messages = (
+                f"{field}: {' '.join(field_messages)}"
+                for field, field_messages in e.message_dict.items()
+            )
+            errors.append((number, "; ".join(messages)))
+        except InvalidOperation:
+            errors.append((number, "price is not a number"))
+        except ValueError as e:
+            errors.append((number, str(e)))
+        else:
+            products.append((number, path, product))
+    return products, errors
+
+
+def import_catalog(
+    rows,
+    *,
+    batch_size=5000,
+    create_missing=True,
+    start=1,
+    progress=None,
+):
+    """
+    Import ``rows`` and yield ``(rows read, products imported, errors)``
+    after every committed batch, ``errors`` being ``(row number, message)``
+    pairs of the rows of the batch that were skipped. Rows are numbered
+    from ``start``.
+
+    ``progress`` is a ``CatalogImport`` whose count of rows is saved by the
+    transaction of every batch, so a batch is never both committed and
+    still to import. The catalog pages are invalidated as every batch
+    commits.
+    """
+    paths = load_category_paths()
+    rows = enumerate(rows, start=start)
+    read = 0
+    while batch := list(islice(rows, batch_size)):
+        read += len(batch)
+        products, errors = parse_rows(batch)
+        with transaction.atomic():
+            missing = {path for _, path, _ in products if path not in paths}
+            if missing and create_missing:
+                create_categories(paths, missing)
+            valid = []
+            for number, path, product in products:
+                if not path:
+                    errors.append((number, "category is empty"))
+                elif path not in paths:
+                    errors.append((number, "unknown category"))
+                else:
+                    product.category_id = paths[path]
+                    valid.append(product)
+            Product.objects.copy_insert(valid)
+            if progress is not None:
+                progress.rows = start - 1 + read
+                progress.save(update_fields=["rows", "updated_at"])
+            transaction.on_commit(invalidate_catalog)
+        yield read, len(valid), sorted(errors)
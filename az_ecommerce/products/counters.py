@@ -0,0 +1,132 @@
+"""
+Buffered like counters.
+
+With ``LIKE_COUNT_BUFFERING`` on, likes and unlikes only add to a per-product
+delta in a Redis hash, which ``manage.py flush_like_counts`` writes to
+``Product.like_count`` in batches. A product that is liked thousands of
+times a second then costs one row update per flush instead of thousands of
+updates queueing on its row lock. Without buffering every change is applied
+to the row directly. ``manage.py rebuild_like_counts`` recounts them from
+the likes.
+
+A like only changes the product's own response right away. The cached list
+pages shared by everyone are rebuilt by the flush, or, without buffering,
+once they expire or the catalog changes otherwise.
+"""
+
+import contextlib
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Greatest
+from redis.exceptions import ResponseError
+
+from az_ecommerce.products.cache import get_redis
+from az_ecommerce.products.cache import invalidate_product_details
+from az_ecommerce.products.cache import invalidate_products
+from az_ecommerce.products.models import Product
+
+LIKE_DELTAS_KEY = "products:like-count:deltas"
+FLUSHING_KEY = "products:like-count:flushing"
+FLUSH_LOCK_KEY = "products:like-count:flush-lock"
+# Milliseconds, longer than any flush takes. A lock left by a crashed flush
+# expires after this.
+FLUSH_LOCK_TIMEOUT = 10 * 60 * 1000
+
+
+class FlushInProgressError(Exception):
+    pass
+
+
+def record_like_delta(product_id, delta):
+    record_like_deltas({product_id: delta})
+
+
+def record_like_deltas(deltas):
+    """Add ``{product_id: delta}`` to the like counts of the products."""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if settings.LIKE_COUNT_BUFFERING:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for product_id, delta in deltas.items():
+                pipe.hincrby(LIKE_DELTAS_KEY, product_id, delta)
+            pipe.execute()
+        return
+    apply_like_deltas(sorted(deltas.items()))
+    invalidate_product_details(sorted(deltas))
+
+
+def apply_like_deltas(pairs):
+    """Apply ``(product_id, delta)`` pairs to ``like_count`` in one UPDATE."""
+    return Product.objects.filter(
+        pk__in=[product_id for product_id, _ in pairs],
+    ).update(
+        like_count=Greatest(
+            F("like_count")
+            + Case(
+                *(
+                    When(pk=product_id, then=Value(delta))
+                    for product_id, delta in pairs
+                ),
+                default=Value(0),
+            ),
+            0,
+        ),
+    )
+
+
+@contextlib.contextmanager
+def flush_lock(redis):
+    """
+    Hold the flush lock or raise ``FlushInProgressError``.
+
+    Two flushes would both read the renamed hash before either deletes it
+    and add every delta twice.
+    """
+    token = uuid.uuid4().hex.encode()
+    if not redis.set(FLUSH_LOCK_KEY, token, nx=True, px=FLUSH_LOCK_TIMEOUT):
+        raise FlushInProgressError
+    try:
+        yield
+    finally:
+        # Only release our own lock, an expired one may be another flush's.
+        if redis.get(FLUSH_LOCK_KEY) == token:
+            redis.delete(FLUSH_LOCK_KEY)
+
+
+def flush_like_counts(batch_size=500):
+    """
+    Write the buffered deltas to the database, return how many products
+    were updated.
+
+    The pending hash is renamed before it is read, so likes recorded while
+    the flush runs go to a fresh hash and are left for the next one. A hash
+    left behind by a failed flush is retried before new deltas are taken.
+    Raises ``FlushInProgressError`` while another flush runs.
+    """
+    redis = get_redis()
+    with flush_lock(redis):
+        # Raises when nothing was liked since the last flush.
+        with contextlib.suppress(ResponseError):
+            redis.renamenx(LIKE_DELTAS_KEY, FLUSHING_KEY)
+
+        deltas = {
+            int(product_id): int(delta)
+            for product_id, delta in redis.hgetall(FLUSHING_KEY).items()
+            if int(delta)
+        }
+        # Sorted, so concurrent updates lock rows in the same order.
+        pending = sorted(deltas.items())
+        with transaction.atomic():
+            for start in range(0, len(pending), batch_size):
+                apply_like_deltas(pending[start : start + batch_size])
+        redis.delete(FLUSHING_KEY)
+    if deltas:
+        invalidate_products(deltas)
+    return len(deltas)
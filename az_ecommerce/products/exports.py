@@ -0,0 +1,114 @@
+"""
+Streaming exports of products, ratings and likes as CSV or NDJSON.
+
+Rows are read in primary key order, one keyset page per query, with the
+related names joined in the same query. Each page is its own short
+statement, so an export of any size holds neither the whole table in
+memory nor a transaction or cursor open for as long as the client takes
+to download it. Every page is written out as one string.
+"""
+
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Export name -> model and (column, lookup) pairs, the primary key first.
+EXPORTS = {
+    "products": (
+        Product,
+        [
+            ("id", "id"),
+            ("title", "title"),
+            ("description", "description"),
+            ("price", "price"),
+            ("size", "size"),
+            ("color", "color"),
+            ("quantity", "quantity"),
+            ("image", "image"),
+            ("category_id", "category_id"),
+            ("category", "category__name"),
+            ("like_count", "like_count"),
+            ("rating_count", "rating_count"),
+            ("rating_avg", "rating_avg"),
+        ],
+    ),
+    "ratings": (
+        Rating,
+        [
+            ("id", "id"),
+            ("product_id", "product_id"),
+            ("product", "product__title"),
+            ("user_id", "user_id"),
+            ("user", "user__email"),
+            ("score", "score"),
+            ("review", "review"),
+            ("created_at", "created_at"),
+        ],
+    ),
+    "likes": (
+        Like,
+        [
+            ("id", "id"),
+            ("product_id", "product_id"),
+            ("product", "product__title"),
+            ("user_id", "user_id"),
+            ("user", "user__email"),
+        ],
+    ),
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_pages(name, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the rows of the export ``name`` as lists of tuples."""
+    model, columns = EXPORTS[name]
+    rows = model.objects.order_by("pk").values_list(
+        *[lookup for _, lookup in columns],
+    )
+    page = list(rows[:chunk_size])
+    while page:
+        yield page
+        if len(page) < chunk_size:
+            return
+        page = list(rows.filter(pk__gt=page[-1][0])[:chunk_size])
+
+
+def export_csv(name, chunk_size=EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column for column, _ in EXPORTS[name][1]])
+    for page in export_pages(name, chunk_size):
+        writer.writerows(page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only the header is left when there was nothing to export.
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(name, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = [column for column, _ in EXPORTS[name][1]]
+    encoder = DjangoJSONEncoder()
+    for page in export_pages(name, chunk_size):
+        yield "".join(
+            encoder.encode(dict(zip(columns, row, strict=True))) + "\n" for row in page
+        )
+
+
+def export(name, file_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return an iterator of the export ``name`` in ``file_format``."""
+    if file_format == "csv":
+        return export_csv(name, chunk_size)
+    return export_ndjson(name, chunk_size)
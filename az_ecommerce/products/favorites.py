@@ -0,0 +1,108 @@
+"""
+Per-user favorite product ids.
+
+With ``FAVORITE_IDS_CACHE`` on, each user's favorite product ids are kept in
+a Redis set, so checking whether a product is a favorite is a SISMEMBER
+instead of a query. The set is filled from the database on first use and
+then kept up to date when favorites are added or removed. Without the
+cache every lookup reads the database, and so does a lookup while Redis is
+unavailable.
+"""
+
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from az_ecommerce.products.cache import get_redis
+from az_ecommerce.products.models import Favorites
+
+FAVORITE_IDS_KEY = "products:favorites:{user_id}"
+# Counts removals from the set, watched while the set is filled.
+FAVORITE_REMOVALS_KEY = "products:favorites:{user_id}:removals"
+# Member set once the database favorites were copied into the set, which
+# tells a loaded empty set from a missing one.
+LOADED_MEMBER = "loaded"
+FAVORITE_IDS_TIMEOUT = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+
+
+def get_favorite_ids(user):
+    """Return the ids of the products the user favorited."""
+    if not user.is_authenticated:
+        return set()
+    if not settings.FAVORITE_IDS_CACHE:
+        return set(read_favorite_ids(user.pk))
+    try:
+        members = get_redis().smembers(load_favorite_ids(user.pk))
+    except RedisError:
+        logger.warning("Cannot read the favorites of %s from Redis", user.pk)
+        return set(read_favorite_ids(user.pk))
+    return {int(member) for member in members if member.isdigit()}
+
+
+def is_favorited(user, product_id):
+    if not user.is_authenticated:
+        return False
+    if not settings.FAVORITE_IDS_CACHE:
+        return Favorites.objects.filter(user=user, product_id=product_id).exists()
+    try:
+        return bool(get_redis().sismember(load_favorite_ids(user.pk), product_id))
+    except RedisError:
+        logger.warning("Cannot read the favorites of %s from Redis", user.pk)
+        return Favorites.objects.filter(user=user, product_id=product_id).exists()
+
+
+def read_favorite_ids(user_id):
+    return list(
+        Favorites.objects.filter(user_id=user_id).values_list(
+            "product_id",
+            flat=True,
+        ),
+    )
+
+
+def load_favorite_ids(user_id):
+    """
+    Fill the user's set from the database unless it is already there, and
+    return its key.
+
+    Ids are added to whatever the set holds, so an id added while this
+    reads the database is kept. An id removed meanwhile would be added
+    back, so the fill only goes through if nothing was removed since the
+    read started, and is retried otherwise. The removals are counted in
+    their own key, a removal from a set that does not exist yet would not
+    touch the set's key.
+    """
+    key = FAVORITE_IDS_KEY.format(user_id=user_id)
+
+    def fill(pipe):
+        if pipe.sismember(key, LOADED_MEMBER):
+            return
+        product_ids = read_favorite_ids(user_id)
+        pipe.multi()
+        pipe.sadd(key, LOADED_MEMBER, *product_ids)
+        pipe.expire(key, FAVORITE_IDS_TIMEOUT)
+
+    get_redis().transaction(fill, FAVORITE_REMOVALS_KEY.format(user_id=user_id))
+    return key
+
+
+def add_favorite_ids(user_id, product_ids):
+    if settings.FAVORITE_IDS_CACHE and product_ids:
+        key = FAVORITE_IDS_KEY.format(user_id=user_id)
+        with get_redis().pipeline() as pipe:
+            pipe.sadd(key, *product_ids)
+            pipe.expire(key, FAVORITE_IDS_TIMEOUT)
+            pipe.execute()
+
+
+def remove_favorite_ids(user_id, product_ids):
+    if settings.FAVORITE_IDS_CACHE and product_ids:
+        removals = FAVORITE_REMOVALS_KEY.format(user_id=user_id)
+        with get_redis().pipeline() as pipe:
+            pipe.srem(FAVORITE_IDS_KEY.format(user_id=user_id), *product_ids)
+            pipe.incr(removals)
+            pipe.expire(removals, FAVORITE_IDS_TIMEOUT)
+            pipe.execute()
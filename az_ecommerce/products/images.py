@@ -0,0 +1,147 @@
+"""
+Responsive image variants.
+
+After a product or category image is saved, fixed-width WebP and JPEG
+copies of it are rendered with Pillow on a small thread pool and stored next
+to the original through the image field's storage, e.g.
+``products_images/shirt_320w.webp``. Their names are recorded in the
+model's ``image_variants`` and serializers expose them as ``srcset``
+strings. ``manage.py generate_image_variants`` renders the variants of
+images saved before this existed or while no worker was running.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image
+from PIL import ImageOps
+from PIL import UnidentifiedImageError
+
+from az_ecommerce.products.cache import invalidate_catalog
+from az_ecommerce.products.cache import invalidate_product
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+# Extension -> Pillow format and save options.
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor  # noqa: PLW0603
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix="image-variants",
+        )
+    return _executor
+
+
+def variant_name(name, width, extension):
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}_{width}w.{extension}"))
+
+
+def render_variants(storage, name):
+    """
+    Render and store the variants of the image ``name`` and return
+    ``{"source": name, extension: {width: variant name}}``.
+
+    Images are never scaled up, one narrower than the smallest width only
+    gets re-encoded at its own width.
+    """
+    with storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        widths = [width for width in VARIANT_WIDTHS if width < image.width]
+        widths = widths or [image.width]
+        variants = {"source": name}
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            variants[extension] = {}
+            for width in widths:
+                height = max(round(image.height * width / image.width), 1)
+                resized = image.resize(
+                    (width, height),
+                    Image.Resampling.LANCZOS,
+                    reducing_gap=3.0,
+                )
+                if image_format == "JPEG" and resized.mode != "RGB":
+                    resized = resized.convert("RGB")
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+
+                target = variant_name(name, width, extension)
+                # Storages that never overwrite would save under a new name.
+                if storage.exists(target):
+                    storage.delete(target)
+                variants[extension][str(width)] = storage.save(
+                    target,
+                    ContentFile(buffer.getvalue()),
+                )
+    return variants
+
+
+def generate_variants(model, pk, name):
+    """Render the variants of ``name`` and record them on the instance."""
+    try:
+        variants = render_variants(model.image.field.storage, name)
+    except (OSError, UnidentifiedImageError):
+        logger.warning("Cannot render variants of %s", name, exc_info=True)
+        return False
+    # Skipped when the image was replaced in the meantime.
+    if not model.objects.filter(pk=pk, image=name).update(image_variants=variants):
+        return False
+    if model is Product:
+        invalidate_product(pk)
+    elif model is Category:
+        # Imported here, the category tree builder uses ``image_srcset``.
+        from az_ecommerce.products.utils import invalidate_category_tree
+
+        invalidate_category_tree()
+        invalidate_catalog()
+    return True
+
+
+def schedule_variants(model, pk, name):
+    if not settings.IMAGE_VARIANT_WORKERS:
+        generate_variants(model, pk, name)
+        return
+    get_executor().submit(run_in_worker, model, pk, name)
+
+
+def run_in_worker(model, pk, name):
+    try:
+        generate_variants(model, pk, name)
+    except Exception:
+        logger.exception("Generating variants of %s failed", name)
+    finally:
+        # Worker threads open their own connection, do not leave it behind.
+        connection.close()
+
+
+def image_srcset(storage, name, variants):
+    """
+    Return ``{extension: srcset}`` for the variants of the image ``name``,
+    or an empty dict until they were rendered.
+    """
+    if not name or not variants or variants.get("source") != name:
+        return {}
+    return {
+        extension: ", ".join(
+            f"{storage.url(variants[extension][width])} {width}w"
+            for width in sorted(variants[extension], key=int)
+        )
+        for extension in VARIANT_FORMATS
+        if extension in variants
+    }
@@ -0,0 +1,172 @@
+"""
+Stock reservations.
+
+``Product.quantity`` is the stock still free to sell. Putting a product in a
+cart takes the quantity out of it with a conditional ``UPDATE`` and records
+it as a ``Reservation`` of that user, taking it out of the cart puts it
+back. A reservation expires ``RESERVATION_TIMEOUT`` seconds after it last
+changed, and ``manage.py release_expired_reservations`` returns the stock of
+expired ones in batches. Checkout reserves the cart again, which is a no-op
+for holds that are still there.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from az_ecommerce.products.cache import invalidate_catalog
+from az_ecommerce.products.cache import invalidate_product_details
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Reservation
+
+
+def invalidate_stock(changes, left):
+    """
+    Refresh the responses of products whose stock changed by ``changes``
+    and now is ``left``.
+
+    Carts change stock all the time, so only the product's own response is
+    refreshed on every change. The list pages shared by everyone are only
+    rebuilt when a product sells out or comes back, the quantities they
+    show may lag behind until then.
+    """
+    invalidate_product_details(sorted(changes))
+    # Stock before the change was what is left plus what was taken.
+    if any(
+        (quantity > 0) != (quantity + changes[pk] > 0) for pk, quantity in left.items()
+    ):
+        invalidate_catalog()
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Not enough stock for products {product_ids}")
+
+
+def reserve(user, deltas=None, quantities=None):
+    """
+    Change the stock held for the user and return the quantities now held.
+
+    ``deltas`` are added to the current holds and ``quantities`` replace
+    them, 0 releases a hold. Raises ``OutOfStockError`` without changing
+    anything when a product does not have enough stock left.
+    """
+    deltas = deltas or {}
+    quantities = quantities or {}
+    product_ids = sorted(set(deltas) | set(quantities))
+    if not product_ids:
+        return {}
+
+    expires_at = timezone.now() + timedelta(seconds=settings.RESERVATION_TIMEOUT)
+    growing = [
+        product_id
+        for product_id in product_ids
+        if quantities.get(product_id, deltas.get(product_id)) > 0
+    ]
+    with transaction.atomic():
+        # Every hold that may grow gets a row first and the rows are locked,
+        # so concurrent changes to one hold queue up instead of overwriting
+        # each other, and the release job skips them.
+        Reservation.objects.bulk_create(
+            [
+                Reservation(
+                    user=user,
+                    product_id=product_id,
+                    quantity=0,
+                    expires_at=expires_at,
+                )
+                for product_id in growing
+            ],
+            ignore_conflicts=True,
+        )
+        held = dict(
+            Reservation.objects.filter(user=user, product_id__in=product_ids)
+            .order_by("product_id")
+            .select_for_update()
+            .values_list("product_id", "quantity"),
+        )
+        targets = {
+            product_id: max(held.get(product_id, 0) + delta, 0)
+            for product_id, delta in deltas.items()
+        }
+        targets.update(quantities)
+        changes = {
+            product_id: target - held.get(product_id, 0)
+            for product_id, target in targets.items()
+            if target != held.get(product_id, 0)
+        }
+        Reservation.objects.filter(
+            user=user,
+            product_id__in=[pk for pk, target in targets.items() if not target],
+        ).delete()
+        Reservation.objects.bulk_create(
+            [
+                Reservation(
+                    user=user,
+                    product_id=product_id,
+                    quantity=target,
+                    expires_at=expires_at,
+                )
+                for product_id, target in sorted(targets.items())
+                if target
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "product"],
+            update_fields=["quantity", "expires_at"],
+        )
+        # Last, so the product rows stay locked for as short as possible,
+        # a popular product has every reservation queue on its row. The
+        # cart views run outside a request transaction for the same reason.
+        left = Product.objects.take_stock(changes)
+        if len(left) != len(changes):
+            raise OutOfStockError(sorted(changes.keys() - left.keys()))
+        if changes:
+            # The product responses show the stock left.
+            transaction.on_commit(partial(invalidate_stock, changes, left))
+    return targets
+
+
+def release(user, product_ids=None):
+    """Give back the stock held for the user, or only for ``product_ids``."""
+    held = Reservation.objects.filter(user=user)
+    if product_ids is not None:
+        held = held.filter(product_id__in=product_ids)
+    return reserve(
+        user,
+        quantities=dict.fromkeys(held.values_list("product_id", flat=True), 0),
+    )
+
+
+def release_expired(batch_size=500):
+    """
+    Give back the stock of expired reservations, ``batch_size`` at a time,
+    and return how many were released.
+
+    Holds locked by a request changing them are skipped rather than
+    waited for, that request renews them anyway.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = list(
+                Reservation.objects.filter(expires_at__lte=timezone.now())
+                .order_by("pk")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", "product_id", "quantity")[:batch_size],
+            )
+            if not expired:
+                return released
+            Reservation.objects.filter(pk__in=[pk for pk, _, _ in expired]).delete()
+            returned = Counter()
+            for _, product_id, quantity in expired:
+                returned[product_id] -= quantity
+            left = Product.objects.take_stock(returned)
+            transaction.on_commit(partial(invalidate_stock, returned, left))
+        released += len(expired)
+        if len(expired) < batch_size:
+            return released
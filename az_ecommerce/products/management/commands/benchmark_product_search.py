@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from az_ecommerce.products.api.filters import ProductSearchFilter
+from az_ecommerce.products.models import Product
+
+DEFAULT_TERMS = ["shirt", "red dress", "cotton", "leather shoes", "zzzz"]
+
+
+class TitleSearchView:
+    """Stand-in for the view configuration the old ``SearchFilter`` used."""
+
+    search_fields = ["title"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSearchFilter against the ILIKE based DRF SearchFilter "
+        "on the current product table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("terms", nargs="*", default=DEFAULT_TERMS)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Runs per term and backend, the median is reported.",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=24,
+            help="Rows fetched per run, like one page of the product list.",
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Print the query plan of the first run of every query.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{Product.objects.count()} products")
+        self.stdout.write(f"{'term':<20} {'ilike ms':>10} {'fts ms':>10} {'rows':>6}")
+        for term in options["terms"]:
+            request = Request(APIRequestFactory().get("/", {"search": term}))
+            ilike = (
+                SearchFilter()
+                .filter_queryset(request, Product.objects.all(), TitleSearchView())
+                .order_by("-id")
+            )
+            fts = (
+                ProductSearchFilter()
+                .filter_queryset(request, Product.objects.all(), None)
+                .order_by("-search_rank", "-id")
+            )
+            ilike_ms, _ = self.measure(ilike, options)
+            fts_ms, rows = self.measure(fts, options)
+            self.stdout.write(f"{term:<20} {ilike_ms:>10.2f} {fts_ms:>10.2f} {rows:>6}")
+
+    def measure(self, queryset, options):
+        page = queryset[: options["page_size"]]
+        if options["explain"]:
+            self.stdout.write(page.explain(analyze=True))
+        timings = []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            rows = len(list(page.values_list("pk", flat=True)))
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), rows
@@ -0,0 +1,128 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+
+from az_ecommerce.products.inventory import OutOfStockError
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+BENCHMARK_EMAIL = "reservation-benchmark-{}@example.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Reserve one product from many threads at once and report the "
+        "throughput, the latencies and whether any stock was oversold. "
+        "Creates a throwaway product and users and deletes them afterwards, "
+        "do not run it against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=16,
+            help="Concurrent clients, each with its own connection and user.",
+        )
+        parser.add_argument(
+            "--reservations",
+            type=int,
+            default=200,
+            help="Reservations of one unit made by every thread.",
+        )
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Starting stock, defaults to 90%% of the reservations made.",
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1 or options["reservations"] < 1:
+            msg = "--threads and --reservations must be positive."
+            raise CommandError(msg)
+        attempts = threads * options["reservations"]
+        stock = options["stock"]
+        if stock is None:
+            stock = attempts * 9 // 10
+
+        category = Category.objects.create(name="Reservation benchmark")
+        product = Product.objects.create(
+            title="Reservation benchmark",
+            description="",
+            price=1,
+            image="",
+            color="",
+            quantity=stock,
+            category=category,
+        )
+        users = [
+            get_user_model().objects.create(
+                email=BENCHMARK_EMAIL.format(i),
+                phone=f"bench{i}",
+            )
+            for i in range(threads)
+        ]
+        try:
+            timings, refused, elapsed = self.run(product, users, options)
+            product.refresh_from_db()
+            held = sum(
+                product.reservations.values_list("quantity", flat=True),
+            )
+        finally:
+            product.delete()
+            category.delete()
+            get_user_model().objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        timings.sort()
+        self.stdout.write(f"{attempts} reservations from {threads} threads")
+        self.stdout.write(f"{attempts / elapsed:.0f} reservations/s")
+        self.stdout.write(
+            f"latency ms p50 {statistics.median(timings):.2f} "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} "
+            f"max {timings[-1]:.2f}",
+        )
+        self.stdout.write(f"{attempts - refused} reserved, {refused} out of stock")
+        if held + product.quantity != stock or product.quantity < 0:
+            msg = f"Stock does not add up: {held} held, {product.quantity} left."
+            raise CommandError(msg)
+        self.stdout.write(self.style.SUCCESS("No stock oversold or lost."))
+
+    def run(self, product, users, options):
+        barrier = threading.Barrier(len(users) + 1)
+        timings = []
+        refused = []
+        lock = threading.Lock()
+
+        def client(user):
+            own_timings, own_refused = [], 0
+            try:
+                barrier.wait()
+                for _ in range(options["reservations"]):
+                    start = time.perf_counter()
+                    try:
+                        reserve(user, deltas={product.pk: 1})
+                    except OutOfStockError:
+                        own_refused += 1
+                    own_timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                timings.extend(own_timings)
+                refused.append(own_refused)
+
+        workers = [threading.Thread(target=client, args=(user,)) for user in users]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        return timings, sum(refused), time.perf_counter() - start
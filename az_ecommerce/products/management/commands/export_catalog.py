@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from az_ecommerce.products.exports import EXPORT_CHUNK_SIZE
+from az_ecommerce.products.exports import EXPORT_FORMATS
+from az_ecommerce.products.exports import EXPORTS
+from az_ecommerce.products.exports import export
+
+
+class Command(BaseCommand):
+    help = "Write products, ratings or likes to a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=list(EXPORTS))
+        parser.add_argument(
+            "--format",
+            choices=list(EXPORT_FORMATS),
+            default="csv",
+            dest="file_format",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to, standard output by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Number of rows read per query.",
+        )
+
+    def handle(self, *args, **options):
+        chunks = export(options["name"], options["file_format"], options["chunk_size"])
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with Path(options["output"]).open("w", encoding="utf-8", newline="") as file:
+            file.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
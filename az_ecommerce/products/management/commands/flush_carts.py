@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from az_ecommerce.products.carts import get_cart_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the carts changed in Redis to the database. "
+        'Schedule it to run every minute or so when CART_STORAGE is "redis".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of carts written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.CART_STORAGE != "redis":
+            msg = "CART_STORAGE is not redis, carts are written directly."
+            raise CommandError(msg)
+        flushed = get_cart_store().flush_all(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} carts."))
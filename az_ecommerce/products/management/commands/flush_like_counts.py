@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from az_ecommerce.products.counters import FlushInProgressError
+from az_ecommerce.products.counters import flush_like_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the like count deltas buffered in Redis to the products. "
+        "Schedule it to run every minute or so when LIKE_COUNT_BUFFERING is on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.LIKE_COUNT_BUFFERING:
+            msg = "LIKE_COUNT_BUFFERING is off, like counts are written directly."
+            raise CommandError(msg)
+        try:
+            flushed = flush_like_counts(batch_size=options["batch_size"])
+        except FlushInProgressError:
+            self.stdout.write(self.style.WARNING("Another flush is running."))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Flushed like counts of {flushed} products."),
+        )
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from az_ecommerce.products.images import generate_variants
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the resized copies of product and category images that do not "
+        "have them yet, e.g. images uploaded before variants existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of images rendered at the same time.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Render the variants of every image again.",
+        )
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in (Category, Product):
+            rows = model.objects.exclude(image="").values_list(
+                "pk",
+                "image",
+                "image_variants",
+            )
+            jobs.extend(
+                (model, pk, image)
+                for pk, image, variants in rows.iterator()
+                if options["all"] or variants.get("source") != image
+            )
+
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as executor:
+            rendered = sum(executor.map(self.render, jobs))
+        message = f"Rendered the variants of {rendered} of {len(jobs)} images."
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def render(self, job):
+        try:
+            return generate_variants(*job)
+        finally:
+            connection.close()
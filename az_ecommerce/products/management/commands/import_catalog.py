@@ -0,0 +1,74 @@
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from az_ecommerce.products.catalog import import_catalog
+from az_ecommerce.products.catalog import read_rows
+from az_ecommerce.products.models import CatalogImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Import products from a CSV or JSON lines file. Progress is saved "
+        "with every batch, running the command again resumes an import "
+        "that was interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="A .csv, .jsonl or .ndjson file.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of rows loaded per transaction.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the saved progress and import the file from its start.",
+        )
+        parser.add_argument(
+            "--no-create-categories",
+            action="store_false",
+            dest="create_categories",
+            help="Skip rows of unknown categories instead of creating them.",
+        )
+
+    def handle(self, *args, **options):
+        progress, created = CatalogImport.objects.get_or_create(
+            source=str(Path(options["path"]).resolve()),
+        )
+        if options["restart"]:
+            progress.rows = 0
+        elif not created:
+            self.stdout.write(f"Resuming after row {progress.rows}")
+        skip = progress.rows
+
+        started = time.monotonic()
+        imported = 0
+        failed = 0
+        for read, batch_imported, errors in import_catalog(
+            islice(read_rows(options["path"]), skip, None),
+            batch_size=options["batch_size"],
+            create_missing=options["create_categories"],
+            start=skip + 1,
+            progress=progress,
+        ):
+            imported += batch_imported
+            failed += len(errors)
+            for number, message in errors:
+                self.stderr.write(f"Row {number}: {message}")
+            rate = read / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"Read {skip + read} rows, imported {imported} ({rate:.0f} rows/s)",
+            )
+
+        progress.delete()
+        message = f"Done, {imported} products imported, {failed} rows skipped."
+        self.stdout.write(self.style.SUCCESS(message))
+        if imported:
+            self.stdout.write(
+                "Run generate_image_variants to render their image variants.",
+            )
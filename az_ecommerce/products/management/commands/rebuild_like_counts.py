@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from az_ecommerce.products.cache import invalidate_catalog
+from az_ecommerce.products.counters import FlushInProgressError
+from az_ecommerce.products.counters import flush_like_counts
+from az_ecommerce.products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the like count stored on every product from its likes. "
+        "Buffered deltas are flushed first, likes recorded while it runs may "
+        "still be counted twice, so run it when traffic is low."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.LIKE_COUNT_BUFFERING:
+            try:
+                flush_like_counts()
+            except FlushInProgressError:
+                msg = "A like count flush is running, try again later."
+                raise CommandError(msg) from None
+
+        batch_size = options["batch_size"]
+        pks = Product.objects.order_by("pk").values_list("pk", flat=True)
+        batch = list(pks[:batch_size])
+        updated = 0
+        while batch:
+            updated += Product.objects.filter(pk__in=batch).update_like_count()
+            self.stdout.write(f"Updated {updated} products")
+            batch = list(pks.filter(pk__gt=batch[-1])[:batch_size])
+
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f"Done, {updated} products updated."))
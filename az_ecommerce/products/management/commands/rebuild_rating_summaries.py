@@ -0,0 +1,92 @@
+from decimal import ROUND_HALF_UP
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Q
+from django.db.models import Sum
+
+from az_ecommerce.products.managers import STAR_COUNT_FIELDS
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+
+SUMMARY_FIELDS = [
+    "rating_count",
+    "rating_sum",
+    "rating_avg",
+    *STAR_COUNT_FIELDS.values(),
+]
+
+
+class Command(BaseCommand):
+    help = "Recompute the rating summary stored on every product from its ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        rebuilt = 0
+        while True:
+            with transaction.atomic():
+                # Lock the batch so ratings written meanwhile wait for us
+                # instead of being overwritten by the recomputed values.
+                products = list(
+                    Product.objects.select_for_update()
+                    .filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk")[:batch_size],
+                )
+                if not products:
+                    break
+                summaries = self.get_summaries(products)
+                for product in products:
+                    self.apply_summary(product, summaries.get(product.pk))
+                Product.objects.bulk_update(products, SUMMARY_FIELDS)
+
+            last_pk = products[-1].pk
+            rebuilt += len(products)
+            self.stdout.write(f"Rebuilt {rebuilt} products")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {rebuilt} products rebuilt."))
+
+    def get_summaries(self, products):
+        rows = (
+            Rating.objects.filter(product__in=products)
+            .order_by()
+            .values("product_id")
+            .annotate(
+                count=Count("id"),
+                total=Sum("score"),
+                **{
+                    field: Count("id", filter=Q(score=star))
+                    for star, field in STAR_COUNT_FIELDS.items()
+                },
+            )
+        )
+        return {row["product_id"]: row for row in rows}
+
+    def apply_summary(self, product, summary):
+        if summary is None:
+            product.rating_count = 0
+            product.rating_sum = 0
+            product.rating_avg = None
+            for field in STAR_COUNT_FIELDS.values():
+                setattr(product, field, 0)
+            return
+
+        product.rating_count = summary["count"]
+        product.rating_sum = summary["total"]
+        product.rating_avg = (Decimal(summary["total"]) / summary["count"]).quantize(
+            Decimal("0.1"),
+            rounding=ROUND_HALF_UP,
+        )
+        for field in STAR_COUNT_FIELDS.values():
+            setattr(product, field, summary[field])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from az_ecommerce.products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search document of every product."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pks = Product.objects.order_by("pk").values_list("pk", flat=True)
+        batch = list(pks[:batch_size])
+        updated = 0
+        while batch:
+            updated += Product.objects.filter(pk__in=batch).update_search_vector()
+            self.stdout.write(f"Updated {updated} products")
+            batch = list(pks.filter(pk__gt=batch[-1])[:batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {updated} products updated."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from az_ecommerce.products.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Give the stock of expired cart reservations back to the products. "
+        "Schedule it to run every minute or so."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of reservations released per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} reservations."))
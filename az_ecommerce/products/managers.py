@@ -0,0 +1,426 @@
+from collections import Counter
+from functools import partial
+
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Prefetch
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
+from django.db.models.functions import NullIf
+
+from az_ecommerce.products.cache import invalidate_user_flags
+
+STAR_COUNT_FIELDS = {
+    1: "star_1_count",
+    2: "star_2_count",
+    3: "star_3_count",
+    4: "star_4_count",
+    5: "star_5_count",
+}
+
+SEARCH_CONFIG = "english"
+
+# Upper bounds of the price facet buckets, the last bucket is open ended.
+PRICE_BUCKETS = [25, 50, 100, 200, 500]
+
+FACETS_SQL = """
+    SELECT
+        CASE
+            WHEN GROUPING(size) = 0 THEN 'size'
+            WHEN GROUPING(color) = 0 THEN 'color'
+            WHEN GROUPING(category_id) = 0 THEN 'category'
+            ELSE 'price'
+        END,
+        COALESCE(size, color, category_id::text, price_bucket::text),
+        COUNT(*)
+    FROM (
+        SELECT size, color, category_id,
+               width_bucket(price, %s::numeric[]) AS price_bucket
+        FROM ({products}) AS filtered
+    ) AS products
+    GROUP BY GROUPING SETS ((size), (color), (category_id), (price_bucket))
+"""
+
+
+def product_search_vector(product=None):
+    """
+    Weighted document for product search: title, then description, then
+    the category name, which is read with a subquery.
+
+    Without ``product`` the document is built from the columns of each row,
+    for ``UPDATE`` statements. With it, from the values of ``product``, so
+    that ``Product.save()`` writes it in the same statement as the row.
+    """
+    from az_ecommerce.products.models import Category
+
+    if product is None:
+        title, description = F("title"), F("description")
+        category_id = OuterRef("category_id")
+    else:
+        title, description = Value(product.title), Value(product.description)
+        category_id = product.category_id
+    category_name = Subquery(
+        Category.objects.filter(pk=category_id).values("name")[:1],
+    )
+    return (
+        SearchVector(title, weight="A", config=SEARCH_CONFIG)
+        + SearchVector(description, weight="B", config=SEARCH_CONFIG)
+        + SearchVector(category_name, weight="C", config=SEARCH_CONFIG)
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def facet_counts(self):
+        """
+        Count the matched products per size, color, category and price
+        bucket with a single grouped query over this queryset.
+        """
+        products = self.order_by().values("size", "color", "category_id", "price")
+        sql, params = products.query.sql_with_params()
+        facets = {"size": {}, "color": {}, "category": {}, "price": {}}
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(FACETS_SQL.format(products=sql), [PRICE_BUCKETS, *params])
+            for facet, value, count in cursor.fetchall():
+                facets[facet][value] = count
+
+        def by_count(counts, cast=str):
+            return [
+                {"value": cast(value), "count": count}
+                for value, count in sorted(counts.items(), key=lambda item: -item[1])
+            ]
+
+        bounds = [None, *PRICE_BUCKETS, None]
+        return {
+            "size": by_count(facets["size"]),
+            "color": by_count(facets["color"]),
+            "category": by_count(facets["category"], int),
+            "price": [
+                {
+                    "min": bounds[int(bucket)],
+                    "max": bounds[int(bucket) + 1],
+                    "count": count,
+                }
+                for bucket, count in sorted(
+                    facets["price"].items(),
+                    key=lambda item: int(item[0]),
+                )
+            ],
+        }
+
+    def estimated_count(self):
+        """
+        Return the planner's estimate of the number of rows in the table,
+        or -1 while it was never analyzed.
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [self.model._meta.db_table],  # noqa: SLF001
+            )
+            row = cursor.fetchone()
+        return row[0] if row else -1
+
+    def update_search_vector(self):
+        return self.update(search_vector=product_search_vector())
+
+    def update_like_count(self):
+        """Recount ``like_count`` from the likes, one statement for all rows."""
+        from az_ecommerce.products.models import Like
+
+        likes = (
+            Like.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.update(like_count=Coalesce(Subquery(likes), 0))
+
+    def apply_rating_change(self, *, added=None, removed=None):
+        """
+        Fold a single rating change into the stored rating summary.
+
+        ``added`` is the score of a rating that now counts towards the
+        product and ``removed`` the score of one that no longer does, so an
+        edited rating passes both. Everything is expressed relative to the
+        current column values, which keeps concurrent changes from
+        overwriting each other.
+        """
+        count = 0
+        total = 0
+        stars = Counter()
+        if added is not None:
+            count += 1
+            total += added
+            stars[added] += 1
+        if removed is not None:
+            count -= 1
+            total -= removed
+            stars[removed] -= 1
+
+        updates = {
+            STAR_COUNT_FIELDS[star]: F(STAR_COUNT_FIELDS[star]) + delta
+            for star, delta in stars.items()
+            if delta and star in STAR_COUNT_FIELDS
+        }
+        if not updates and not count and not total:
+            return 0
+        updates["rating_count"] = F("rating_count") + count
+        updates["rating_sum"] = F("rating_sum") + total
+        # The right-hand side sees the values from before this UPDATE.
+        updates["rating_avg"] = Cast(
+            F("rating_sum") + total,
+            models.DecimalField(max_digits=12, decimal_places=4),
+        ) / NullIf(F("rating_count") + count, 0)
+        return self.update(**updates)
+
+    def take_stock(self, changes):
+        """
+        Subtract ``{product_id: quantity}`` from the stock of the products
+        that have enough of it and return ``{product_id: stock left}`` for
+        those.
+
+        A single ``UPDATE ... WHERE quantity >= n``, so the check and the
+        write cannot be split by a concurrent reservation. Negative
+        quantities put stock back and always apply.
+        """
+        if not changes:
+            return {}
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)  # noqa: SLF001
+        # Sorted, so concurrent reservations lock the rows in the same order.
+        rows = sorted(changes.items())
+        values = ", ".join(["(%s, %s)"] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS product "  # noqa: S608
+                "SET quantity = product.quantity - change.quantity "
+                f"FROM (VALUES {values}) AS change (id, quantity) "
+                "WHERE product.id = change.id "
+                "AND product.quantity >= change.quantity "
+                "RETURNING product.id, product.quantity",
+                [value for row in rows for value in row],
+            )
+            return dict(cursor.fetchall())
+
+
+    def copy_insert(self, products):
+        """
+        Insert unsaved ``products`` with ``COPY`` and return their ids.
+
+        ``COPY`` cannot return the ids it assigns, so they are drawn from the
+        table's sequence first and written with the rows. That also finds
+        the rows again for their search vector, which is set in one
+        ``UPDATE`` afterwards.
+        """
+        if not products:
+            return []
+        connection = connections[self.db]
+        meta = self.model._meta  # noqa: SLF001
+        fields = [
+            field for field in meta.concrete_fields if field.name != "search_vector"
+        ]
+        table = connection.ops.quote_name(meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+                "FROM generate_series(1, %s)",
+                [meta.db_table, meta.pk.column, len(products)],
+            )
+            ids = [pk for (pk,) in cursor.fetchall()]
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                for product, pk in zip(products, ids, strict=True):
+                    product.pk = pk
+                    copy.write_row(
+                        [
+                            field.get_db_prep_save(
+                                getattr(product, field.attname),
+                                connection,
+                            )
+                            for field in fields
+                        ],
+                    )
+        self.filter(pk__in=ids).update_search_vector()
+        return ids
+
+
+class UserProductQuerySet(models.QuerySet):
+    """Queries for the (user, product) pairs of ``Like`` and ``Favorites``."""
+
+    def add(self, user, product):
+        """
+        Insert the pair unless it already exists and return whether a row
+        was written.
+
+        This is a single ``INSERT ... ON CONFLICT DO NOTHING``, so repeated
+        and concurrent calls for the same pair are harmless.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)  # noqa: SLF001
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, product_id) VALUES (%s, %s) "  # noqa: S608
+                "ON CONFLICT (user_id, product_id) DO NOTHING",
+                [user.pk, product.pk],
+            )
+            created = cursor.rowcount == 1
+        if created:
+            # A raw insert sends no post_save, do what its receivers would.
+            transaction.on_commit(partial(invalidate_user_flags, user.pk))
+            self.after_add(user, [product.pk])
+        return created
+
+    def remove(self, user, product):
+        deleted, _ = self.filter(user=user, product=product).delete()
+        return bool(deleted)
+
+    def bulk_add(self, user, products):
+        """
+        Add the pairs for all of ``products`` in a single statement and
+        return the ids of the products that were not paired yet.
+
+        Only the rows this statement inserted are returned, so a pair that a
+        concurrent request inserted first is neither reported nor counted
+        twice.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)  # noqa: SLF001
+        with connection.cursor() as cursor:
+            # Sorted, so concurrent adds lock the rows in the same order.
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, product_id) "  # noqa: S608
+                "SELECT %s, product_id FROM unnest(%s::bigint[]) AS product_id "
+                "ORDER BY product_id "
+                "ON CONFLICT (user_id, product_id) DO NOTHING RETURNING product_id",
+                [user.pk, [product.pk for product in products]],
+            )
+            added = [product_id for (product_id,) in cursor.fetchall()]
+        if added:
+            # A raw insert sends no post_save, do what its receivers would.
+            transaction.on_commit(partial(invalidate_user_flags, user.pk))
+            self.after_add(user, added)
+        return added
+
+    def bulk_remove(self, user, products):
+        """
+        Delete the pairs for all of ``products`` in a single statement and
+        return the ids of the products that were paired.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)  # noqa: SLF001
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE user_id = %s "  # noqa: S608
+                "AND product_id = ANY(%s) RETURNING product_id",
+                [user.pk, [product.pk for product in products]],
+            )
+            removed = [product_id for (product_id,) in cursor.fetchall()]
+        if removed:
+            # A raw delete sends no post_delete either.
+            transaction.on_commit(partial(invalidate_user_flags, user.pk))
+            self.after_remove(user, removed)
+        return removed
+
+    def after_add(self, user, product_ids):
+        pass
+
+    def after_remove(self, user, product_ids):
+        pass
+
+
+class FavoritesQuerySet(UserProductQuerySet):
+    def after_add(self, user, product_ids):
+        from az_ecommerce.products.favorites import add_favorite_ids
+
+        transaction.on_commit(partial(add_favorite_ids, user.pk, product_ids))
+
+    def after_remove(self, user, product_ids):
+        from az_ecommerce.products.favorites import remove_favorite_ids
+
+        transaction.on_commit(partial(remove_favorite_ids, user.pk, product_ids))
+
+
+class LikeQuerySet(UserProductQuerySet):
+    def after_add(self, user, product_ids):
+        self.count_likes(product_ids, 1)
+
+    def after_remove(self, user, product_ids):
+        self.count_likes(product_ids, -1)
+
+    def count_likes(self, product_ids, delta):
+        from az_ecommerce.products.counters import record_like_deltas
+
+        deltas = dict.fromkeys(product_ids, delta)
+        transaction.on_commit(partial(record_like_deltas, deltas))
+
+
+def line_total(prefix=""):
+    return models.ExpressionWrapper(
+        F(f"{prefix}quantity") * F(f"{prefix}product__price"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate ``item_count`` and ``subtotal`` and prefetch the items with
+        their products and line totals, two queries whatever the cart size.
+        """
+        from az_ecommerce.products.models import CartItem
+
+        items = CartItem.objects.with_totals().order_by("id")
+        return self.annotate(
+            item_count=Coalesce(Sum("items__quantity"), 0),
+            subtotal=Coalesce(
+                Sum(line_total("items__")),
+                0,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        ).prefetch_related(Prefetch("items", queryset=items))
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.select_related("product").annotate(line_total=line_total())
+
+    def add(self, cart, product, quantity=1):
+        """
+        Add ``quantity`` of ``product`` to the cart and return the quantity
+        now in it.
+        """
+        return self.bulk_add(cart, {product.pk: quantity})[product.pk]
+
+    def bulk_add(self, cart, quantities):
+        """
+        Add ``{product_id: quantity}`` to the cart and return the quantities
+        now in it.
+
+        This is a single ``INSERT ... ON CONFLICT DO UPDATE`` against the
+        (cart, product) unique constraint, so concurrent adds of the same
+        product all land on one row and none of them is lost.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)  # noqa: SLF001
+        # Sorted, so concurrent adds lock the rows in the same order.
+        rows = sorted(quantities.items())
+        values = ", ".join(["(%s, %s, %s)"] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} AS item (cart_id, product_id, quantity) "  # noqa: S608
+                f"VALUES {values} "
+                "ON CONFLICT (cart_id, product_id) "
+                "DO UPDATE SET quantity = item.quantity + EXCLUDED.quantity "
+                "RETURNING product_id, quantity",
+                [value for row in rows for value in (cart.pk, *row)],
+            )
+            return dict(cursor.fetchall())
@@ -0,0 +1,90 @@
+# Generated by Django 5.0.9 on 2026-10-18 11:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    # One statement: the migration runs in one transaction that holds the
+    # table locked since its ALTER TABLE, batches would not release it.
+    Product = apps.get_model('products', 'Product')
+    Rating = apps.get_model('products', 'Rating')
+    stars = ', '.join(
+        f'star_{star}_count = r.star_{star}' for star in range(1, 6)
+    )
+    star_counts = ', '.join(
+        f'count(*) FILTER (WHERE score = {star}) AS star_{star}'
+        for star in range(1, 6)
+    )
+    sql = f"""
+        UPDATE {Product._meta.db_table} AS p
+        SET rating_count = r.count,
+            rating_sum = r.total,
+            rating_avg = round(r.total::numeric / r.count, 1),
+            {stars}
+        FROM (
+            SELECT product_id, count(*) AS count, sum(score) AS total,
+                   {star_counts}
+            FROM {Rating._meta.db_table}
+            GROUP BY product_id
+        ) AS r
+        WHERE p.id = r.product_id
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=2, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='star_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='score',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
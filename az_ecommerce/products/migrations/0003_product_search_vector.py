@@ -0,0 +1,58 @@
+# Generated by Django 5.0.9 on 2026-10-18 11:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Max
+from django.db.models import OuterRef
+from django.db.models import Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_search_vectors(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1],
+    )
+    search_vector = (
+        SearchVector('title', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english')
+        + SearchVector(category_name, weight='C', config='english')
+    )
+    max_pk = Product.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    # Outside a transaction every batch is committed on its own.
+    for start in range(0, max_pk, BATCH_SIZE):
+        Product.objects.filter(
+            pk__gt=start,
+            pk__lte=start + BATCH_SIZE,
+        ).update(search_vector=search_vector)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, but it does
+    # not block writes to the table while the index is built.
+    atomic = False
+
+    dependencies = [
+        ('products', '0002_product_rating_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.9 on 2026-10-18 11:41
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, but it does
+    # not block writes to the table while the index is built.
+    atomic = False
+
+    dependencies = [
+        ('products', '0003_product_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(fields=['tree_id', 'lft', 'rght'], name='category_tree_range_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.9 on 2026-10-18 11:45
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, but it does
+    # not block writes to the tables while the indexes are built.
+    atomic = False
+
+    dependencies = [
+        ('products', '0004_category_tree_range_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'product'], name='cartitem_cart_product_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['title', 'id'], name='product_title_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='rating',
+            index=models.Index(condition=models.Q(('review', ''), _negated=True), fields=['product', '-created_at', '-id'], name='rating_product_review_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.9 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+def backfill_like_counts(apps, schema_editor):
+    # One statement: the migration runs in one transaction that holds the
+    # table locked since its ALTER TABLE, batches would not release it.
+    Like = apps.get_model('products', 'Like')
+    Product = apps.get_model('products', 'Product')
+    sql = f"""
+        UPDATE {Product._meta.db_table} AS p
+        SET like_count = l.count
+        FROM (
+            SELECT product_id, count(*) AS count
+            FROM {Like._meta.db_table}
+            GROUP BY product_id
+        ) AS l
+        WHERE p.id = l.product_id
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='like',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+    ]
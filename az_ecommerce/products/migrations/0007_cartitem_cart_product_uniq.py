@@ -0,0 +1,59 @@
+# Generated by Django 5.0.9 on 2026-10-18 12:05
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    CartItem = apps.get_model("products", "CartItem")
+    duplicates = (
+        CartItem.objects.values("cart", "product")
+        .annotate(keep=Min("id"), total=Sum("quantity"), rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        CartItem.objects.filter(pk=duplicate["keep"]).update(quantity=duplicate["total"])
+        CartItem.objects.filter(
+            cart=duplicate["cart"],
+            product=duplicate["product"],
+        ).exclude(pk=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    # Like 0005, the unique index is built concurrently and the constraint
+    # is then attached to it, so the cart table is never locked for writes.
+    atomic = False
+
+    dependencies = [
+        ('products', '0006_product_like_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "cartitem_cart_product_uniq" '
+                    'ON "products_cartitem" ("cart_id", "product_id")',
+                    'DROP INDEX CONCURRENTLY IF EXISTS "cartitem_cart_product_uniq"',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE "products_cartitem" ADD CONSTRAINT "cartitem_cart_product_uniq" '
+                    'UNIQUE USING INDEX "cartitem_cart_product_uniq"',
+                    'ALTER TABLE "products_cartitem" DROP CONSTRAINT "cartitem_cart_product_uniq"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='cartitem',
+                    constraint=models.UniqueConstraint(fields=('cart', 'product'), name='cartitem_cart_product_uniq'),
+                ),
+            ],
+        ),
+        RemoveIndexConcurrently(
+            model_name='cartitem',
+            name='cartitem_cart_product_idx',
+        ),
+    ]
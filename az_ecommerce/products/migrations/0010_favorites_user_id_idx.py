@@ -0,0 +1,20 @@
+# Generated by Django 5.0.9 on 2026-10-18 12:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('products', '0009_order'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='favorites',
+            index=models.Index(fields=['user', '-id'], name='favorites_user_id_idx'),
+        ),
+    ]
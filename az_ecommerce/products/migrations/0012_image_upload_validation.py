@@ -0,0 +1,24 @@
+# Generated by Django 5.0.9 on 2026-10-18 12:06
+
+import az_ecommerce.products.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=models.FileField(blank=True, upload_to='categories-images/', validators=[az_ecommerce.products.uploads.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.FileField(upload_to='products_images/', validators=[az_ecommerce.products.uploads.validate_image_upload]),
+        ),
+    ]
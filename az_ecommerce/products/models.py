@@ -1,14 +1,34 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MaxValueValidator
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db import transaction
 from mptt.models import MPTTModel
 from mptt.models import TreeForeignKey
 
+from .managers import STAR_COUNT_FIELDS
+from .managers import CartItemQuerySet
+from .managers import CartQuerySet
+from .managers import FavoritesQuerySet
+from .managers import LikeQuerySet
+from .managers import ProductQuerySet
+from .managers import product_search_vector
+from .uploads import validate_image_upload
+
 User = get_user_model()
 
 
 class Category(MPTTModel):
     name = models.CharField(max_length=120)
-    image = models.FileField(upload_to="categories-images/", blank=True)
+    image = models.FileField(
+        upload_to="categories-images/",
+        blank=True,
+        validators=[validate_image_upload],
+    )
+    # Resized copies of ``image``, see ``products.images``.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     parent = TreeForeignKey(
         "self",
         on_delete=models.PROTECT,
@@ -17,12 +37,31 @@ class Category(MPTTModel):
         related_name="children",
     )
 
+    # ``name`` as last read from or written to the database, so the signal
+    # handlers only rebuild the search documents of products on a rename.
+    stored_name = None
+
     class MPTTMeta:
         order_insertion_by = ["name"]
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["tree_id", "lft", "rght"],
+                name="category_tree_range_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "name" in instance.__dict__:
+            instance.stored_name = instance.name
+        return instance
+
 
 class Size(models.TextChoices):
     S = "small"
@@ -32,28 +71,88 @@ class Size(models.TextChoices):
     XXL = "xx-large"
 
 
+# Fields the search document of a product is built from.
+SEARCHED_FIELDS = {"title", "description", "category", "category_id"}
+
+
 class Product(models.Model):
     title = models.CharField(max_length=120)
     description = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     size = models.CharField(max_length=10, choices=Size.choices, blank=True)
-    image = models.FileField(upload_to="products_images/")
+    image = models.FileField(
+        upload_to="products_images/",
+        validators=[validate_image_upload],
+    )
+    # Resized copies of ``image``, see ``products.images``.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     color = models.CharField(max_length=120)
     quantity = models.IntegerField()
-    like = models.ManyToManyField(User, related_name="liked_products", blank=True)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="products",
+    )
+    # Written in batches from buffered deltas, see ``products.counters``.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    # Rating summary, kept in step with ``Rating`` by the signals in
+    # ``products.signals`` and rebuilt by ``manage.py rebuild_rating_summaries``.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    star_1_count = models.PositiveIntegerField(default=0, editable=False)
+    star_2_count = models.PositiveIntegerField(default=0, editable=False)
+    star_3_count = models.PositiveIntegerField(default=0, editable=False)
+    star_4_count = models.PositiveIntegerField(default=0, editable=False)
+    star_5_count = models.PositiveIntegerField(default=0, editable=False)
+    # Written by ``save()`` and by ``products.signals`` when a category is
+    # renamed, see ``product_search_vector``.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_vector_gin"),
+            # Keyset pagination orders, see ProductPagination.
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+            models.Index(fields=["title", "id"], name="product_title_id_idx"),
+            models.Index(
+                fields=["category", "price", "id"],
+                name="product_category_price_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        searched = update_fields is None or SEARCHED_FIELDS & set(update_fields)
+        if searched:
+            # Written by the same statement as the row.
+            self.search_vector = product_search_vector(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_vector"}
+        super().save(*args, **kwargs)
+        if searched:
+            # Computed by the database, read again when used.
+            del self.search_vector
+
     def avg_rate(self):
-        ratings = self.ratings.all()
-        if ratings.exists():
-            return round(ratings.aggregate(models.Avg("score"))["score__avg"], 1)
-        return None
+        return float(self.rating_avg) if self.rating_avg is not None else None
 
     def tot_rating(self):
-        return self.ratings.count()
+        return self.rating_count
+
+    def rating_histogram(self):
+        return {star: getattr(self, field) for star, field in STAR_COUNT_FIELDS.items()}
 
 
 class Favorites(models.Model):
@@ -64,8 +163,14 @@ class Favorites(models.Model):
         related_name="favorited_by",
     )
 
+    objects = FavoritesQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "product")
+        indexes = [
+            # A user's favorites, newest first.
+            models.Index(fields=["user", "-id"], name="favorites_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product} it is favorited by {self.user}"
@@ -79,6 +184,8 @@ class Like(models.Model):
         related_name="likes",
     )
 
+    objects = LikeQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "product")
 
@@ -93,33 +200,185 @@ class Rating(models.Model):
         on_delete=models.CASCADE,
         related_name="ratings",
     )
-    score = models.IntegerField()
+    score = models.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)],
+    )
     review = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # (product_id, score) as last read from or written to the database, so
+    # the signal handlers know what to take back out of the product summary.
+    stored_rating = None
+
     class Meta:
         unique_together = ("user", "product")
+        indexes = [
+            # Newest written reviews of a product.
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="rating_product_review_idx",
+                condition=~models.Q(review=""),
+            ),
+        ]
 
     def __str__(self):
         return f"Rating{self.score} for {self.product.title} by {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        # The product summary is updated from post_save, keep both writes in
+        # one transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            if self.stored_rating is None and not self._state.adding:
+                # Loaded with product or score deferred, read what the
+                # summary counts before it is overwritten.
+                self.stored_rating = (
+                    Rating.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("product_id", "score")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "product_id" in instance.__dict__ and "score" in instance.__dict__:
+            instance.stored_rating = (instance.product_id, instance.score)
+        return instance
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cart")
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"cart of {self.user.username}"
 
+
 class CartItem(models.Model):
     cart = models.ForeignKey(
-        Cart, on_delete=models.CASCADE, related_name="items"
+        Cart,
+        on_delete=models.CASCADE,
+        related_name="items",
     )
     product = models.ForeignKey(
-        Product, on_delete=models.CASCADE, related_name="items"
+        Product,
+        on_delete=models.CASCADE,
+        related_name="items",
     )
     quantity = models.IntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product"],
+                name="cartitem_cart_product_uniq",
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.product.name} - {self.quantity}"
-    
+        return f"{self.product.title} - {self.quantity}"
+
     def tot_price(self):
-        return self.product.price * self.quantity
\ No newline at end of file
+        # Annotated by ``CartItem.objects.with_totals()``.
+        if hasattr(self, "line_total"):
+            return self.line_total
+        return self.product.price * self.quantity
+
+
+class Reservation(models.Model):
+    """Stock held for a product in a user's cart until ``expires_at``."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "product"],
+                name="reservation_user_product_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} of {self.product_id} for {self.user_id}"
+
+
+class Order(models.Model):
+    class Status(models.TextChoices):
+        PLACED = "placed", "Placed"
+        PAID = "paid", "Paid"
+        CANCELLED = "cancelled", "Cancelled"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PLACED,
+    )
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    # The Idempotency-Key header the order was placed with, and a hash of
+    # the request it came with, so a retry returns this order again.
+    idempotency_key = models.CharField(max_length=255, blank=True, editable=False)
+    request_hash = models.CharField(max_length=64, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                condition=~models.Q(idempotency_key=""),
+                name="order_user_idempotency_key_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-id"], name="order_user_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"order {self.pk} of {self.user}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="order_items",
+    )
+    # Copied from the product when the order is placed.
+    title = models.CharField(max_length=120)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.title} - {self.quantity}"
+
+    def line_total(self):
+        return self.price * self.quantity
+
+
+class CatalogImport(models.Model):
+    # The resolved path of the imported file.
+    source = models.CharField(max_length=255, unique=True)
+    # Rows of the file read by the committed batches, saved in the same
+    # transaction as their products.
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} after row {self.rows}"
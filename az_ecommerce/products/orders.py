@@ -0,0 +1,113 @@
+"""
+Checkout.
+
+``place_order`` turns the user's cart into an ``Order`` in one short
+transaction: the cart is reserved once more, which only takes stock for
+holds that expired, the lines are written with one ``bulk_create`` with the
+prices of the moment, and the holds and the cart are cleared.
+
+Orders placed with an ``Idempotency-Key`` remember it. Placing an order
+again with the same key returns the stored order instead of placing a
+second one, also when the retry races the first request.
+"""
+
+from functools import partial
+
+from django.db import IntegrityError
+from django.db import transaction
+
+from az_ecommerce.products.carts import get_cart_store
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.models import Order
+from az_ecommerce.products.models import OrderItem
+from az_ecommerce.products.models import Reservation
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+class IdempotencyKeyReusedError(Exception):
+    """The key was already used for a different request."""
+
+
+def get_order_for_key(user, idempotency_key, request_hash):
+    """Return the order placed with the key, or None."""
+    if not idempotency_key:
+        return None
+    order = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+    if order is not None and order.request_hash != request_hash:
+        raise IdempotencyKeyReusedError
+    return order
+
+
+def place_order(user, idempotency_key="", request_hash=""):
+    """
+    Place an order for the user's cart and return ``(order, created)``.
+
+    ``created`` is False when the key was used before and the stored order
+    is returned.
+    """
+    order = get_order_for_key(user, idempotency_key, request_hash)
+    if order is not None:
+        return order, False
+
+    store = get_cart_store()
+    # A cart kept in Redis is written through at checkout.
+    store.flush(user)
+    try:
+        with transaction.atomic():
+            order = create_order(user, idempotency_key, request_hash)
+    except IntegrityError:
+        # A request with the same key committed first.
+        order = get_order_for_key(user, idempotency_key, request_hash)
+        if order is None:
+            raise
+        return order, False
+    transaction.on_commit(partial(store.clear, user))
+    return order, True
+
+
+def create_order(user, idempotency_key, request_hash):
+    # Inserted first, so a concurrent retry with the same key waits on the
+    # unique constraint before it does any work, and fails once this commits.
+    order = Order.objects.create(
+        user=user,
+        total=0,
+        idempotency_key=idempotency_key,
+        request_hash=request_hash,
+    )
+    items = list(
+        CartItem.objects.filter(cart__user=user)
+        .select_related("product")
+        .order_by("id"),
+    )
+    if not items:
+        raise EmptyCartError
+
+    # Takes the stock of holds that expired since the items were added,
+    # raises OutOfStockError when it is gone.
+    reserve(user, quantities={item.product_id: item.quantity for item in items})
+
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(
+                order=order,
+                product=item.product,
+                title=item.product.title,
+                price=item.product.price,
+                quantity=item.quantity,
+            )
+            for item in items
+        ],
+    )
+    order.total = sum(item.product.price * item.quantity for item in items)
+    order.save(update_fields=["total"])
+    # The stock now belongs to the order.
+    Reservation.objects.filter(
+        user=user,
+        product_id__in=[item.product_id for item in items],
+    ).delete()
+    CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+    return order
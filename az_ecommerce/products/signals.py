@@ -0,0 +1,143 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from az_ecommerce.products.cache import invalidate_catalog
+from az_ecommerce.products.cache import invalidate_product
+from az_ecommerce.products.cache import invalidate_user_flags
+from az_ecommerce.products.counters import record_like_delta
+from az_ecommerce.products.favorites import add_favorite_ids
+from az_ecommerce.products.favorites import remove_favorite_ids
+from az_ecommerce.products.images import schedule_variants
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+from az_ecommerce.products.utils import invalidate_category_tree
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_product, instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def generate_image_variants_on_save(sender, instance, raw, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image_variants.get("source") == instance.image.name:
+        return
+    transaction.on_commit(
+        partial(schedule_variants, sender, instance.pk, instance.image.name),
+    )
+
+
+@receiver(post_save, sender=Category)
+def update_search_vector_on_category_save(
+    sender,
+    instance,
+    created,
+    raw,
+    update_fields,
+    **kwargs,
+):
+    if update_fields is not None and "name" not in update_fields:
+        return
+    renamed = not created and instance.stored_name != instance.name
+    instance.stored_name = instance.name
+    # Saves that keep the name, like image uploads and tree moves, leave the
+    # products of a large category alone.
+    if renamed and not raw:
+        Product.objects.filter(category=instance).update_search_vector()
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_summary_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = None if created else instance.stored_rating
+    current = (instance.product_id, instance.score)
+    if previous == current:
+        return
+
+    if previous and previous[0] == instance.product_id:
+        Product.objects.filter(pk=instance.product_id).apply_rating_change(
+            added=instance.score,
+            removed=previous[1],
+        )
+    else:
+        if previous:
+            Product.objects.filter(pk=previous[0]).apply_rating_change(
+                removed=previous[1],
+            )
+        Product.objects.filter(pk=instance.product_id).apply_rating_change(
+            added=instance.score,
+        )
+    instance.stored_rating = current
+
+    changed = {instance.product_id}
+    if previous:
+        changed.add(previous[0])
+    for product_id in changed:
+        transaction.on_commit(partial(invalidate_product, product_id))
+
+
+@receiver(post_delete, sender=Rating)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    product_id, score = instance.stored_rating or (instance.product_id, instance.score)
+    Product.objects.filter(pk=product_id).apply_rating_change(removed=score)
+    transaction.on_commit(partial(invalidate_product, product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_category_tree_on_change(sender, **kwargs):
+    # Wait for the commit, a rebuild before it would cache the old tree
+    # under the new version.
+    transaction.on_commit(invalidate_category_tree)
+    # Category names are searchable and the tree drives ?category=.
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+def invalidate_user_flags_on_change(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_user_flags, instance.user_id))
+
+
+@receiver(post_save, sender=Like)
+def count_like_on_save(sender, instance, created, raw, **kwargs):
+    # Like.objects.add() inserts without post_save and counts by itself.
+    if created and not raw:
+        transaction.on_commit(partial(record_like_delta, instance.product_id, 1))
+
+
+@receiver(post_delete, sender=Like)
+def count_like_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(record_like_delta, instance.product_id, -1))
+
+
+@receiver(post_save, sender=Favorites)
+def cache_favorite_id_on_save(sender, instance, created, raw, **kwargs):
+    # Favorites.objects.add() inserts without post_save and caches by itself.
+    if created and not raw:
+        transaction.on_commit(
+            partial(add_favorite_ids, instance.user_id, [instance.product_id]),
+        )
+
+
+@receiver(post_delete, sender=Favorites)
+def uncache_favorite_id_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(remove_favorite_ids, instance.user_id, [instance.product_id]),
+    )
@@ -0,0 +1,25 @@
+import fakeredis
+import pytest
+
+from az_ecommerce.products import carts
+from az_ecommerce.products import counters
+from az_ecommerce.products import favorites
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis(redis_server, monkeypatch):
+    """
+    A fake Redis returned by every ``get_redis()`` of the products app.
+
+    Test modules override the fixture to switch on the setting that makes
+    their feature use it.
+    """
+    redis = fakeredis.FakeRedis(server=redis_server)
+    for module in (carts, counters, favorites):
+        monkeypatch.setattr(module, "get_redis", lambda: redis)
+    return redis
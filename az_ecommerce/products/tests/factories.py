@@ -0,0 +1,29 @@
+from factory import SubFactory
+from factory import sequence
+from factory.django import DjangoModelFactory
+
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+
+class CategoryFactory(DjangoModelFactory[Category]):
+    name = "Shirts"
+
+    class Meta:
+        model = Category
+
+
+class ProductFactory(DjangoModelFactory[Product]):
+    description = "A shirt"
+    price = 10
+    image = "products_images/shirt.jpg"
+    color = "red"
+    quantity = 10
+    category = SubFactory(CategoryFactory)
+
+    @sequence
+    def title(n: int) -> str:  # noqa: N805
+        return f"Shirt {n}"
+
+    class Meta:
+        model = Product
@@ -0,0 +1,95 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from az_ecommerce.products import admin as products_admin
+from az_ecommerce.products.inventory import release
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def products(category):
+    return [
+        ProductFactory(title=f"{color.title()} shirt", color=color, category=category)
+        for color in ("red", "blue", "green")
+    ]
+
+
+def test_changelist_queries_do_not_grow(
+    admin_client,
+    products,
+    django_assert_max_num_queries,
+):
+    # Session, user, the savepoint pair, count and page; categories joined.
+    with django_assert_max_num_queries(7):
+        response = admin_client.get("/admin/products/product/")
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response.context["cl"].result_count == len(products)
+
+
+def test_changelist_counts_from_statistics(admin_client, products, monkeypatch):
+    monkeypatch.setattr(products_admin, "APPROXIMATE_COUNT_THRESHOLD", 1)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE products_product")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get("/admin/products/product/")
+
+    assert response.context["cl"].result_count == Product.objects.estimated_count()
+    assert not [query for query in queries if "COUNT(" in query["sql"]]
+    # Searches are counted exactly.
+    response = admin_client.get("/admin/products/product/", {"q": "blue"})
+    assert [p.title for p in response.context["cl"].result_list] == ["Blue shirt"]
+    assert response.context["cl"].result_count == 1
+
+
+def test_search_by_id(admin_client, products):
+    response = admin_client.get("/admin/products/product/", {"q": products[2].pk})
+
+    assert list(response.context["cl"].result_list) == [products[2]]
+
+
+def test_mark_out_of_stock(admin_client, products, monkeypatch):
+    monkeypatch.setattr(products_admin, "BULK_ACTION_BATCH_SIZE", 2)
+    user = UserFactory()
+    reserve(user, deltas={products[0].pk: 2, products[2].pk: 1})
+    kept = ProductFactory(category=products[0].category)
+    reserve(user, deltas={kept.pk: 1})
+
+    admin_client.post(
+        "/admin/products/product/",
+        {
+            "action": "mark_out_of_stock",
+            "_selected_action": [product.pk for product in products],
+        },
+    )
+
+    assert set(
+        Product.objects.exclude(pk=kept.pk).values_list("quantity", flat=True),
+    ) == {0}
+    # Releasing the carts gives nothing back to the products sold out.
+    release(user)
+    assert set(
+        Product.objects.exclude(pk=kept.pk).values_list("quantity", flat=True),
+    ) == {0}
+    kept.refresh_from_db()
+    assert kept.quantity == 10  # noqa: PLR2004
+
+
+def test_search_by_non_ascii_digits(admin_client, products):
+    response = admin_client.get("/admin/products/product/", {"q": "²"})
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert list(response.context["cl"].result_list) == []
+
+
+def test_category_is_an_autocomplete(admin_client, products):
+    response = admin_client.get(f"/admin/products/product/{products[0].pk}/change/")
+
+    assert "admin-autocomplete" in response.content.decode()
@@ -0,0 +1,169 @@
+import pytest
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.tests.factories import ProductFactory
+
+THREADS = 8
+ADDS_PER_THREAD = 5
+
+
+@pytest.fixture
+def cart(user):
+    return Cart.objects.create(user=user)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_adds_land_on_one_row(cart, product, run_in_parallel):
+    def add():
+        for _ in range(ADDS_PER_THREAD):
+            CartItem.objects.add(cart, product, 2)
+
+    run_in_parallel([add] * THREADS)
+
+    item = CartItem.objects.get(cart=cart, product=product)
+    assert item.quantity == THREADS * ADDS_PER_THREAD * 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_add_to_cart_requests(user, product, run_in_parallel):
+    def add():
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(ADDS_PER_THREAD):
+            response = client.post(
+                "/api/cart/",
+                {"product_id": product.pk, "quantity": 1},
+                format="json",
+            )
+            assert response.status_code == 201  # noqa: PLR2004
+
+    # The cart itself is created by the first request of each user.
+    Cart.objects.create(user=user)
+    run_in_parallel([add] * THREADS)
+
+    assert CartItem.objects.filter(product=product).count() == 1
+    assert CartItem.objects.get(product=product).quantity == THREADS * ADDS_PER_THREAD
+
+
+def test_add_returns_the_new_quantity(cart, product):
+    assert CartItem.objects.add(cart, product) == 1
+    assert CartItem.objects.add(cart, product, 3) == 4  # noqa: PLR2004
+
+
+# The cart views run outside a request transaction, the error response
+# would mark the transaction of the test for rollback.
+@pytest.mark.django_db(transaction=True)
+def test_add_to_cart_rejects_unknown_products(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post("/api/cart/", {"product_id": 0}, format="json")
+
+    assert response.status_code == 400  # noqa: PLR2004
+    assert not CartItem.objects.exists()
+
+
+def test_cart_totals_take_constant_queries(
+    user,
+    cart,
+    product,
+    django_assert_max_num_queries,
+):
+    for _ in range(20):
+        other = ProductFactory(price="2.50", quantity=100, category=product.category)
+        CartItem.objects.add(cart, other, 2)
+    CartItem.objects.add(cart, product, 3)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    # The savepoint pair of ATOMIC_REQUESTS, the cart and its items.
+    with django_assert_max_num_queries(4):
+        response = client.get("/api/cart/")
+
+    (body,) = response.json()
+    assert body["item_count"] == 43  # noqa: PLR2004
+    assert body["subtotal"] == "130.00"
+    assert len(body["items"]) == 21  # noqa: PLR2004
+    assert body["items"][-1]["tot_price"] == 30  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("size", [4, 40])
+def test_batch_applies_all_operations(
+    user,
+    cart,
+    product,
+    size,
+    django_assert_num_queries,
+):
+    others = ProductFactory.create_batch(
+        size,
+        price=1,
+        quantity=100,
+        category=product.category,
+    )
+    CartItem.objects.add(cart, product, 5)
+    CartItem.objects.add(cart, others[0], 1)
+    client = APIClient()
+    client.force_authenticate(user)
+    operations = [
+        {"op": "add", "product_id": product.pk, "quantity": 2},
+        {"op": "remove", "product_id": others[0].pk},
+        {"op": "set", "product_id": others[1].pk, "quantity": 4},
+    ]
+    for other in others[2:]:
+        operations += [{"op": "add", "product_id": other.pk, "quantity": 1}] * 2
+
+    # One validation query, the stock reservation, one statement per kind of
+    # change and the cart read back with its items, plus the savepoint pairs
+    # of the reservation and the cart write, whatever the batch size.
+    with django_assert_num_queries(16):
+        response = client.post(
+            "/api/cart/batch/",
+            {"operations": operations},
+            format="json",
+        )
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response.json()["item_count"] == 7 + 4 + 2 * (size - 2)
+    assert dict(cart.items.values_list("product_id", "quantity")) == {
+        product.pk: 7,
+        others[1].pk: 4,
+        **{other.pk: 2 for other in others[2:]},
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_rejects_unknown_products(user, product):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        "/api/cart/batch/",
+        {
+            "operations": [
+                {"op": "add", "product_id": product.pk, "quantity": 1},
+                {"op": "set", "product_id": 0, "quantity": 1},
+            ],
+        },
+        format="json",
+    )
+
+    assert response.status_code == 400  # noqa: PLR2004
+    assert not CartItem.objects.exists()
+
+
+def test_remove_item(user, cart, product):
+    CartItem.objects.add(cart, product)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        "/api/cart/remove-item/",
+        {"product_id": product.pk},
+        format="json",
+    )
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert not CartItem.objects.exists()
@@ -0,0 +1,182 @@
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.carts import DIRTY_CARTS_KEY
+from az_ecommerce.products.carts import RedisCartStore
+from az_ecommerce.products.carts import collapse_operations
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def store(redis):
+    return RedisCartStore(redis)
+
+
+@pytest.fixture
+def redis_carts(settings, redis):
+    settings.CART_STORAGE = "redis"
+
+
+@pytest.fixture
+def products(category):
+    return ProductFactory.create_batch(3, quantity=100, category=category)
+
+
+def cart_contents(user):
+    return dict(
+        CartItem.objects.filter(cart__user=user).values_list("product_id", "quantity"),
+    )
+
+
+def test_changes_stay_in_redis_until_flushed(store, user, products):
+    first, second, _ = products
+
+    assert store.add(user, first, 2) == 2  # noqa: PLR2004
+    assert store.add(user, first, 1) == 3  # noqa: PLR2004
+    store.add(user, second, 1)
+    assert not CartItem.objects.exists()
+
+    assert store.flush_all() == 1
+    assert cart_contents(user) == {first.pk: 3, second.pk: 1}
+
+    assert store.remove(user, second.pk)
+    assert not store.remove(user, second.pk)
+    store.flush(user)
+    assert cart_contents(user) == {first.pk: 3}
+
+
+def test_database_items_are_loaded_once(store, user, products):
+    first, second, _ = products
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.add(cart, first, 4)
+
+    store.add(user, first, 1)
+    store.add(user, second, 1)
+
+    assert store.items(user) == {first.pk: 5, second.pk: 1}
+
+
+def test_load_leaves_concurrent_changes_alone(
+    store,
+    redis,
+    monkeypatch,
+    user,
+    products,
+):
+    first, second, _ = products
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.add(cart, first, 4)
+    CartItem.objects.add(cart, second, 1)
+    transaction = redis.transaction
+
+    def load_elsewhere_first(*args, **kwargs):
+        # Another request loads the cart and sets a quantity after this one
+        # read the database items.
+        monkeypatch.setattr(redis, "transaction", transaction)
+        RedisCartStore(redis).apply(user, [("set", first.pk, 2)])
+        return transaction(*args, **kwargs)
+
+    monkeypatch.setattr(redis, "transaction", load_elsewhere_first)
+    store.load(user)
+
+    assert store.items(user) == {first.pk: 2, second.pk: 1}
+
+
+def test_flush_skips_clean_carts(store, redis, user, products):
+    store.add(user, products[0], 1)
+    store.flush(user)
+
+    assert not redis.sismember(DIRTY_CARTS_KEY, user.pk)
+    assert store.flush_all() == 0
+
+
+def test_flush_writes_carts_in_batches(store, products):
+    users = UserFactory.create_batch(5)
+    for user in users:
+        store.add(user, products[0], 1)
+
+    assert store.flush_all(batch_size=2) == 5  # noqa: PLR2004
+    assert CartItem.objects.filter(product=products[0]).count() == 5  # noqa: PLR2004
+
+
+def test_flush_skips_deleted_users_and_products(store, products):
+    user, deleted_user = UserFactory.create_batch(2)
+    store.add(user, products[0], 1)
+    store.add(user, products[1], 1)
+    store.add(deleted_user, products[0], 1)
+    products[1].delete()
+    deleted_user.delete()
+
+    assert store.flush_all() == 2  # noqa: PLR2004
+    assert cart_contents(user) == {products[0].pk: 1}
+
+
+def test_failed_flush_marks_carts_dirty_again(
+    store,
+    redis,
+    user,
+    products,
+    monkeypatch,
+):
+    def fail(user_ids):
+        raise ConnectionError
+
+    store.add(user, products[0], 1)
+    monkeypatch.setattr(store, "write", fail)
+
+    with pytest.raises(ConnectionError):
+        store.flush_all()
+    assert redis.sismember(DIRTY_CARTS_KEY, user.pk)
+
+
+def test_cart_endpoints_with_redis_storage(redis_carts, user, products):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        "/api/cart/",
+        {"product_id": products[0].pk, "quantity": 2},
+        format="json",
+    )
+    assert response.status_code == 201  # noqa: PLR2004
+    assert not CartItem.objects.exists()
+
+    (body,) = client.get("/api/cart/").json()
+    assert body["item_count"] == 2  # noqa: PLR2004
+    assert cart_contents(user) == {products[0].pk: 2}
+
+    call_command("flush_carts")
+
+
+def test_collapse_operations():
+    operations = [
+        ("add", 1, 2),
+        ("add", 1, 3),
+        ("set", 2, 4),
+        ("add", 2, 1),
+        ("remove", 3, 0),
+        ("remove", 4, 0),
+        ("add", 4, 2),
+        ("set", 5, 0),
+    ]
+
+    assert collapse_operations(operations) == ({1: 5}, {2: 5, 4: 2}, {3, 5})
+
+
+def test_apply_batches_redis_changes(store, user, products):
+    first, second, third = products
+    store.add(user, first, 1)
+    store.add(user, second, 1)
+
+    store.apply(
+        user,
+        [("add", first.pk, 2), ("remove", second.pk, 0), ("set", third.pk, 5)],
+    )
+
+    assert store.items(user) == {first.pk: 3, third.pk: 5}
@@ -0,0 +1,168 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from az_ecommerce.products import catalog
+from az_ecommerce.products.cache import CATALOG_VERSION_KEY
+from az_ecommerce.products.cache import get_version
+from az_ecommerce.products.models import CatalogImport
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+
+pytestmark = pytest.mark.django_db
+
+CSV = """title,description,price,size,color,quantity,image,category
+Oxford shirt,Cotton shirt,25.50,medium,white,4,products_images/a.jpg,Men > Shirts
+Linen shirt,Summer shirt,30,,blue,2,products_images/b.jpg,Men > Shirts
+Broken,No price,,small,red,1,products_images/c.jpg,Men
+Chinos,Cotton trousers,40,large,beige,7,products_images/d.jpg,Men > Trousers
+Odd,Bad size,10,huge,red,1,products_images/e.jpg,Men
+"""
+
+
+def test_import_csv(tmp_path, capsys):
+    men = Category.objects.create(name="Men")
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV)
+
+    call_command("import_catalog", str(path), batch_size=2)
+
+    products = Product.objects.order_by("pk")
+    assert [product.title for product in products] == [
+        "Oxford shirt",
+        "Linen shirt",
+        "Chinos",
+    ]
+    shirts = Category.objects.get(name="Shirts")
+    assert shirts.parent == men
+    assert products[0].category == shirts
+    assert Product.objects.filter(search_vector="oxford").count() == 1
+    # The new categories are placed in the tree.
+    men.refresh_from_db()
+    assert [c.name for c in men.get_descendants()] == ["Shirts", "Trousers"]
+    errors = capsys.readouterr().err
+    assert "Row 3: price is not a number" in errors
+    assert "Row 5: size: " in errors
+    assert not CatalogImport.objects.exists()
+
+
+def write_shirts(path, count=5):
+    rows = [
+        {
+            "title": f"Shirt {i}",
+            "description": "A shirt",
+            "price": 10,
+            "color": "red",
+            "quantity": 1,
+            "image": "products_images/a.jpg",
+            "category": ["Men"],
+        }
+        for i in range(count)
+    ]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def test_import_resumes_from_saved_progress(tmp_path):
+    Category.objects.create(name="Men")
+    path = tmp_path / "catalog.jsonl"
+    write_shirts(path)
+    CatalogImport.objects.create(source=str(path.resolve()), rows=3)
+
+    call_command("import_catalog", str(path))
+
+    assert list(Product.objects.values_list("title", flat=True)) == [
+        "Shirt 3",
+        "Shirt 4",
+    ]
+
+
+def test_interrupted_import_keeps_committed_batches_once(
+    tmp_path,
+    monkeypatch,
+    django_capture_on_commit_callbacks,
+):
+    Category.objects.create(name="Men")
+    path = tmp_path / "catalog.jsonl"
+    write_shirts(path)
+    parse_rows = catalog.parse_rows
+    calls = []
+
+    def crash_on_second_batch(batch):
+        calls.append(batch)
+        if len(calls) == 2:  # noqa: PLR2004
+            msg = "interrupted"
+            raise RuntimeError(msg)
+        return parse_rows(batch)
+
+    monkeypatch.setattr(catalog, "parse_rows", crash_on_second_batch)
+    version = get_version(CATALOG_VERSION_KEY)
+    with (
+        django_capture_on_commit_callbacks(execute=True),
+        pytest.raises(RuntimeError),
+    ):
+        call_command("import_catalog", str(path), batch_size=2)
+
+    # The first batch and its progress were committed together, and its
+    # products are already visible in the catalog.
+    assert CatalogImport.objects.get().rows == 2  # noqa: PLR2004
+    assert Product.objects.count() == 2  # noqa: PLR2004
+    assert get_version(CATALOG_VERSION_KEY) != version
+
+    monkeypatch.setattr(catalog, "parse_rows", parse_rows)
+    call_command("import_catalog", str(path), batch_size=2)
+
+    assert list(Product.objects.order_by("pk").values_list("title", flat=True)) == [
+        f"Shirt {i}" for i in range(5)
+    ]
+    assert not CatalogImport.objects.exists()
+
+
+def test_restart_imports_from_the_start(tmp_path):
+    Category.objects.create(name="Men")
+    path = tmp_path / "catalog.jsonl"
+    write_shirts(path, count=2)
+    CatalogImport.objects.create(source=str(path.resolve()), rows=2)
+
+    call_command("import_catalog", str(path), restart=True)
+
+    assert Product.objects.count() == 2  # noqa: PLR2004
+
+
+def test_unknown_categories_can_be_refused(tmp_path, capsys):
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV)
+
+    call_command("import_catalog", str(path), create_categories=False)
+
+    assert not Product.objects.exists()
+    assert not Category.objects.exists()
+    assert "Row 1: unknown category" in capsys.readouterr().err
+
+
+def test_malformed_json_lines_are_row_errors(tmp_path, capsys):
+    Category.objects.create(name="Men")
+    path = tmp_path / "catalog.jsonl"
+    row = {
+        "title": "Oxford shirt",
+        "description": "Cotton shirt",
+        "price": 25,
+        "color": "white",
+        "quantity": 4,
+        "image": "products_images/a.jpg",
+        "category": ["Men"],
+    }
+    path.write_text(
+        '{"title": "Broken",\n'
+        '["not", "an", "object"]\n'
+        f"{json.dumps(row)}\n"
+        f"{json.dumps({**row, 'quantity': [1]})}\n",
+    )
+
+    call_command("import_catalog", str(path))
+
+    assert list(Product.objects.values_list("title", flat=True)) == ["Oxford shirt"]
+    errors = capsys.readouterr().err
+    assert "Row 1: not valid JSON" in errors
+    assert "Row 2: row is not a JSON object" in errors
+    assert "Row 4: " in errors
@@ -0,0 +1,62 @@
+import pytest
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.cache import VERSION_TIMEOUT
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.tests.factories import CategoryFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tree(category):
+    formal = CategoryFactory(name="Formal", parent=category)
+    return {"shirts": category, "formal": formal}
+
+
+def get_tree():
+    return APIClient().get("/api/categories/tree/").json()
+
+
+def test_tree_is_built_once(tree, django_assert_num_queries):
+    get_tree()
+
+    # Only the savepoint pair of ATOMIC_REQUESTS.
+    with django_assert_num_queries(2):
+        body = get_tree()
+
+    assert [node["name"] for node in body] == ["Shirts"]
+    assert [node["name"] for node in body[0]["children"]] == ["Formal"]
+
+
+def test_tree_follows_changes(tree, django_capture_on_commit_callbacks):
+    get_tree()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tree["formal"].name = "Casual"
+        tree["formal"].save()
+    assert get_tree()[0]["children"][0]["name"] == "Casual"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CategoryFactory(name="Men")
+    assert [node["name"] for node in get_tree()] == ["Men", "Shirts"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Category.objects.get(pk=tree["formal"].pk).move_to(None)
+    assert [node["name"] for node in get_tree()] == ["Men", "Shirts", "Casual"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Category.objects.get(pk=tree["formal"].pk).delete()
+    assert [node["name"] for node in get_tree()] == ["Men", "Shirts"]
+
+
+def test_tree_expires(tree, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "az_ecommerce.products.utils.cache.set",
+        lambda *args, **kwargs: calls.append(kwargs),
+    )
+
+    get_tree()
+
+    assert [call["timeout"] for call in calls] == [VERSION_TIMEOUT]
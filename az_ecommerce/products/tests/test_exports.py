@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Rating
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def products(category):
+    return [ProductFactory(title=f"Shirt {i}", category=category) for i in range(5)]
+
+
+@pytest.fixture
+def admin_client():
+    client = APIClient()
+    client.force_authenticate(UserFactory(is_staff=True))
+    return client
+
+
+def test_products_csv(admin_client, products, django_assert_max_num_queries):
+    response = admin_client.get("/api/exports/products/csv/")
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response["Content-Type"] == "text/csv; charset=utf-8"
+    # One query per page of rows, the category name is joined in.
+    with django_assert_max_num_queries(1):
+        body = b"".join(response.streaming_content).decode()
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [row["title"] for row in rows] == [f"Shirt {i}" for i in range(5)]
+    assert rows[0]["category"] == "Shirts"
+    assert rows[0]["price"] == "10.00"
+
+
+def test_ratings_ndjson_in_pages(admin_client, products, settings, monkeypatch):
+    user = UserFactory()
+    for product in products:
+        Rating.objects.create(user=user, product=product, score=4, review="Fine")
+    monkeypatch.setattr("az_ecommerce.products.exports.EXPORT_CHUNK_SIZE", 2)
+
+    response = admin_client.get("/api/exports/ratings/ndjson/")
+
+    body = b"".join(response.streaming_content)
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [row["product"] for row in rows] == [f"Shirt {i}" for i in range(5)]
+    assert rows[0]["user"] == user.email
+    assert rows[0]["score"] == 4  # noqa: PLR2004
+
+
+def test_exports_are_admin_only(user, products):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    assert client.get("/api/exports/products/csv/").status_code == 403  # noqa: PLR2004
+
+
+def test_export_command(user, products, tmp_path):
+    Like.objects.add(user, products[1])
+    stdout = io.StringIO()
+
+    call_command("export_catalog", "likes", "--format", "ndjson", stdout=stdout)
+
+    assert json.loads(stdout.getvalue())["product_id"] == products[1].pk
+
+    path = tmp_path / "products.csv"
+    call_command("export_catalog", "products", "--chunk-size", "2", output=str(path))
+    assert len(path.read_text().splitlines()) == 6  # noqa: PLR2004
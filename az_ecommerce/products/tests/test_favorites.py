@@ -0,0 +1,119 @@
+import pytest
+from rest_framework.test import APIClient
+
+from az_ecommerce.products import favorites
+from az_ecommerce.products.favorites import get_favorite_ids
+from az_ecommerce.products.favorites import is_favorited
+from az_ecommerce.products.favorites import remove_favorite_ids
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.products.utils import get_user_product_flags
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def products(category):
+    return [ProductFactory(title=f"Shirt {i}", category=category) for i in range(5)]
+
+
+@pytest.fixture
+def redis(redis, settings):
+    settings.FAVORITE_IDS_CACHE = True
+    return redis
+
+
+def test_favorites_are_paginated(user, products, django_assert_max_num_queries):
+    for product in products:
+        Favorites.objects.add(user, product)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    # The savepoint pair and one query for the page with its products.
+    with django_assert_max_num_queries(3):
+        page = client.get("/api/favorites/", {"page_size": 3}).json()
+    assert [item["product"]["title"] for item in page["results"]] == [
+        "Shirt 4",
+        "Shirt 3",
+        "Shirt 2",
+    ]
+    assert "user" not in page["results"][0]
+
+    page = client.get(page["next"]).json()
+    assert [item["product"]["title"] for item in page["results"]] == [
+        "Shirt 1",
+        "Shirt 0",
+    ]
+    assert page["next"] is None
+
+
+def test_favorite_ids_follow_changes(
+    redis,
+    user,
+    products,
+    django_capture_on_commit_callbacks,
+):
+    first, second, third, *_ = products
+    Favorites.objects.create(user=user, product=first)
+
+    assert get_favorite_ids(user) == {first.pk}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorites.objects.add(user, second)
+        Favorites.objects.bulk_add(user, [third])
+        Favorites.objects.remove(user, first)
+
+    assert get_favorite_ids(user) == {second.pk, third.pk}
+    assert is_favorited(user, second.pk)
+    assert not is_favorited(user, first.pk)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorites.objects.bulk_remove(user, [second, third])
+
+    assert get_favorite_ids(user) == set()
+
+
+def test_favorite_ids_without_cache(user, products):
+    Favorites.objects.add(user, products[0])
+
+    assert get_favorite_ids(user) == {products[0].pk}
+    assert is_favorited(user, products[0].pk)
+    assert not is_favorited(user, products[1].pk)
+
+
+def test_favorite_ids_fall_back_to_the_database(
+    redis,
+    redis_server,
+    user,
+    products,
+):
+    redis_server.connected = False
+    Favorites.objects.add(user, products[0])
+
+    assert get_favorite_ids(user) == {products[0].pk}
+    assert is_favorited(user, products[0].pk)
+    assert not is_favorited(user, products[1].pk)
+    flags = get_user_product_flags(user, [product.pk for product in products])
+    assert flags["favorited_ids"] == {products[0].pk}
+
+
+def test_removal_while_loading_is_not_undone(redis, user, products, monkeypatch):
+    first, second, *_ = products
+    Favorites.objects.create(user=user, product=first)
+    Favorites.objects.create(user=user, product=second)
+    read_favorite_ids = favorites.read_favorite_ids
+    reads = []
+
+    def read_then_remove(user_id):
+        product_ids = read_favorite_ids(user_id)
+        if not reads:
+            # Unfavorited after the ids were read, before the set is filled.
+            Favorites.objects.filter(user=user, product=first).delete()
+            remove_favorite_ids(user.pk, [first.pk])
+        reads.append(product_ids)
+        return product_ids
+
+    monkeypatch.setattr(favorites, "read_favorite_ids", read_then_remove)
+
+    assert get_favorite_ids(user) == {second.pk}
+    assert len(reads) == 2  # noqa: PLR2004
@@ -0,0 +1,76 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def make_image(width, height, image_format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 255)).save(buffer, image_format)
+    return SimpleUploadedFile("shirt.png", buffer.getvalue())
+
+
+def test_variants_are_rendered_after_commit(
+    category,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        product = ProductFactory(image=make_image(700, 350), category=category)
+
+    product.refresh_from_db()
+    variants = product.image_variants
+    assert variants["source"] == product.image.name
+    assert sorted(variants["webp"], key=int) == ["160", "320", "640"]
+    storage = product.image.storage
+    with storage.open(variants["webp"]["320"]) as file, Image.open(file) as image:
+        assert image.format == "WEBP"
+        assert image.size == (320, 160)
+    with storage.open(variants["jpeg"]["640"]) as file, Image.open(file) as image:
+        assert image.format == "JPEG"
+
+    body = APIClient().get(f"/api/products/{product.pk}/").json()
+    srcset = body["image_srcset"]["webp"].split(", ")
+    assert [entry.rsplit(" ", 1)[1] for entry in srcset] == ["160w", "320w", "640w"]
+    assert srcset[0].startswith("http://media.testserver/products_images/")
+
+
+def test_small_image_is_not_scaled_up(category, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        product = ProductFactory(image=make_image(100, 100), category=category)
+
+    product.refresh_from_db()
+    assert list(product.image_variants["jpeg"]) == ["100"]
+
+
+def test_unreadable_image_is_skipped(category, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        product = ProductFactory(image="products_images/missing.jpg", category=category)
+
+    product.refresh_from_db()
+    assert product.image_variants == {}
+    body = APIClient().get(f"/api/products/{product.pk}/").json()
+    assert body["image_srcset"] == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_renders_missing_variants(category):
+    product = ProductFactory(image=make_image(400, 200), category=category)
+    # As if uploaded before variants existed.
+    Product.objects.update(image_variants={})
+    Category.objects.update(image=product.image.name)
+
+    call_command("generate_image_variants", workers=1)
+
+    product.refresh_from_db()
+    category.refresh_from_db()
+    assert list(product.image_variants["webp"]) == ["160", "320"]
+    assert category.image_variants["source"] == product.image.name
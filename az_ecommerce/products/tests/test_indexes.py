@@ -0,0 +1,249 @@
+import pytest
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+
+from az_ecommerce.products.managers import SEARCH_CONFIG
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.models import User
+from az_ecommerce.users.tests.factories import UserFactory
+
+# The seeded rows are committed and truncated after each test. Rolled back,
+# they would leave the tables bloated for the tests that come after.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+USERS = 200
+PRODUCTS = 100
+CATEGORIES = 50
+
+
+def insert_rows(model, count, **columns):
+    """
+    Insert ``count`` rows into the table of ``model`` in one statement.
+
+    ``columns`` are SQL expressions of the row number ``n``, counted from
+    0, the other columns are copied from the first row of the table. The
+    rows are stored in a shuffled order, as rows added over time are not
+    stored next to the other rows of their user or product either.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)  # noqa: SLF001
+    names = [
+        field.column
+        for field in model._meta.concrete_fields  # noqa: SLF001
+        if not field.primary_key
+    ]
+    values = [columns.get(name, f"template.{name}") for name in names]
+    with connection.cursor() as cursor:
+        # The same order on every run.
+        cursor.execute("SELECT setseed(0)")
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(names)})"  # noqa: S608
+            f" SELECT {', '.join(values)} FROM generate_series(0, {count - 1}) AS n"
+            f" LEFT JOIN (SELECT * FROM {table} ORDER BY id LIMIT 1) AS template"
+            " ON true ORDER BY random()",
+        )
+
+
+def nth_id(model, position):
+    """SQL expression of the id at ``position``, from 0, of the table's rows."""
+    table = connection.ops.quote_name(model._meta.db_table)  # noqa: SLF001
+    return f"(SELECT array_agg(id ORDER BY id) FROM {table})[1 + {position}]"  # noqa: S608
+
+
+def seed_users():
+    UserFactory()
+    insert_rows(
+        User,
+        USERS - 1,
+        email="'user' || n || '@example.com'",
+        phone="'+3010' || n",
+    )
+
+
+def seed_products(count=PRODUCTS):
+    ProductFactory()
+    insert_rows(Category, CATEGORIES - 1, tree_id="n + 2")
+    title = "CASE WHEN n % 1000 = 0 THEN 'Shirt ' ELSE 'Trousers ' END || n"
+    insert_rows(
+        Product,
+        count - 1,
+        title=title,
+        price="n % 500",
+        category_id=nth_id(Category, f"n % {CATEGORIES}"),
+        search_vector=f"to_tsvector('english', {title})",
+    )
+
+
+def seed_user_products(model, **columns):
+    """Give every user a row of ``model`` for every product."""
+    seed_users()
+    seed_products()
+    insert_rows(
+        model,
+        USERS * PRODUCTS,
+        user_id=nth_id(User, f"n / {PRODUCTS}"),
+        product_id=nth_id(Product, f"n % {PRODUCTS}"),
+        **columns,
+    )
+
+
+def seed_ratings():
+    seed_user_products(
+        Rating,
+        score="1 + n % 5",
+        review="CASE WHEN n % 2 = 0 THEN '' ELSE 'Fine' END",
+        created_at="now() - n * interval '1 minute'",
+    )
+
+
+def seed_cart_items():
+    seed_users()
+    seed_products()
+    insert_rows(Cart, USERS, user_id=nth_id(User, "n"))
+    insert_rows(
+        CartItem,
+        USERS * PRODUCTS,
+        cart_id=nth_id(Cart, f"n % {USERS}"),
+        product_id=nth_id(Product, f"n / {USERS}"),
+        quantity="1",
+    )
+
+
+def seed_categories():
+    # Twenty trees of a thousand flat nodes each.
+    insert_rows(
+        Category,
+        20_000,
+        name="'Category ' || n",
+        image="''",
+        image_variants="'{}'",
+        parent_id="NULL",
+        tree_id="1 + n % 20",
+        lft="n / 20 * 2 + 1",
+        rght="n / 20 * 2 + 2",
+        level="0",
+    )
+
+
+SEEDS = {
+    Like: lambda: seed_user_products(Like),
+    Favorites: lambda: seed_user_products(Favorites),
+    Rating: seed_ratings,
+    CartItem: seed_cart_items,
+    Product: lambda: seed_products(20_000),
+    Category: seed_categories,
+}
+
+
+def first_ids(model, count=1):
+    return list(model.objects.order_by("pk").values_list("pk", flat=True)[:count])
+
+
+def first_id(model):
+    return first_ids(model)[0]
+
+
+# The seeded model, the query, built once the rows exist, and its index.
+HOT_QUERIES = {
+    "like_by_user_and_products": (
+        Like,
+        lambda: Like.objects.filter(
+            user_id=first_id(User),
+            product_id__in=first_ids(Product, 3),
+        ),
+        "products_like_user_id_product_id",
+    ),
+    "favorite_by_user_and_products": (
+        Favorites,
+        lambda: Favorites.objects.filter(
+            user_id=first_id(User),
+            product_id__in=first_ids(Product, 3),
+        ),
+        "products_favorites_user_id_product_id",
+    ),
+    "favorites_of_user": (
+        Favorites,
+        lambda: Favorites.objects.filter(user_id=first_id(User)).order_by("-id")[:24],
+        "favorites_user_id_idx",
+    ),
+    "rating_by_user_and_product": (
+        Rating,
+        lambda: Rating.objects.filter(
+            user_id=first_id(User),
+            product_id=first_id(Product),
+        ),
+        "products_rating_user_id_product_id",
+    ),
+    "likes_of_product": (
+        Like,
+        lambda: Like.objects.filter(product_id=first_id(Product)),
+        "products_like_product_id",
+    ),
+    "cart_item_by_cart_and_product": (
+        CartItem,
+        lambda: CartItem.objects.filter(
+            cart_id=first_id(Cart),
+            product_id=first_id(Product),
+        ),
+        "cartitem_cart_product_uniq",
+    ),
+    "products_by_price": (
+        Product,
+        lambda: Product.objects.filter(price__gte=10).order_by("price", "id")[:24],
+        "product_price_id_idx",
+    ),
+    "products_by_title": (
+        Product,
+        lambda: Product.objects.order_by("title", "id")[:24],
+        "product_title_id_idx",
+    ),
+    "category_products_by_price": (
+        Product,
+        lambda: Product.objects.filter(category_id=first_id(Category)).order_by(
+            "price",
+            "id",
+        )[:24],
+        "product_category_price_idx",
+    ),
+    "category_subtree": (
+        Category,
+        lambda: Category.objects.filter(tree_id=1, lft__gte=2, rght__lte=9),
+        "category_tree_range_idx",
+    ),
+    "product_search": (
+        Product,
+        lambda: Product.objects.filter(
+            search_vector=SearchQuery("shirt", config=SEARCH_CONFIG),
+        ),
+        "product_search_vector_gin",
+    ),
+    "product_reviews": (
+        Rating,
+        lambda: Rating.objects.filter(product_id=first_id(Product))
+        .exclude(review="")
+        .order_by("-created_at", "-id")[:20],
+        "rating_product_review_idx",
+    ),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(name):
+    model, make_queryset, index = HOT_QUERIES[name]
+    # Enough rows that a sequential scan costs more than the index, with
+    # fresh statistics so the plan does not depend on earlier tests.
+    SEEDS[model]()
+    table = model._meta.db_table  # noqa: SLF001
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+    plan = make_queryset().explain()
+
+    assert "Seq Scan" not in plan, plan
+    assert index in plan, plan
@@ -0,0 +1,178 @@
+from datetime import timedelta
+from functools import partial
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.cache import CATALOG_VERSION_KEY
+from az_ecommerce.products.cache import PRODUCT_VERSION_KEY
+from az_ecommerce.products.cache import get_version
+from az_ecommerce.products.carts import DatabaseCartStore
+from az_ecommerce.products.inventory import OutOfStockError
+from az_ecommerce.products.inventory import release
+from az_ecommerce.products.inventory import release_expired
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Reservation
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 10
+
+
+def held(user):
+    return dict(user.reservations.values_list("product_id", "quantity"))
+
+
+def test_reserve_takes_and_returns_stock(user, category):
+    first, second = ProductFactory.create_batch(2, quantity=5, category=category)
+
+    reserve(user, deltas={first.pk: 2, second.pk: 1})
+    reserve(user, deltas={first.pk: 1}, quantities={second.pk: 4})
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.quantity, second.quantity) == (2, 1)
+    assert held(user) == {first.pk: 3, second.pk: 4}
+
+    release(user, [second.pk])
+    second.refresh_from_db()
+    assert second.quantity == 5  # noqa: PLR2004
+    assert held(user) == {first.pk: 3}
+
+
+def test_reserve_changes_nothing_when_out_of_stock(user, category):
+    plenty = ProductFactory(quantity=10, category=category)
+    scarce = ProductFactory(quantity=1, category=category)
+
+    with pytest.raises(OutOfStockError) as error:
+        reserve(user, deltas={plenty.pk: 2, scarce.pk: 2})
+
+    assert error.value.product_ids == [scarce.pk]
+    assert Product.objects.get(pk=plenty.pk).quantity == 10  # noqa: PLR2004
+    assert not Reservation.objects.exists()
+
+
+def test_release_expired_returns_stock(category):
+    product = ProductFactory(quantity=10, category=category)
+    users = UserFactory.create_batch(3)
+    for user in users:
+        reserve(user, deltas={product.pk: 2})
+    Reservation.objects.filter(user__in=users[:2]).update(
+        expires_at=timezone.now() - timedelta(seconds=1),
+    )
+
+    assert release_expired(batch_size=1) == 2  # noqa: PLR2004
+
+    product.refresh_from_db()
+    assert product.quantity == 8  # noqa: PLR2004
+    assert list(Reservation.objects.values_list("user", flat=True)) == [users[2].pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_reservations_never_oversell(category, run_in_parallel):
+    stock = THREADS * ATTEMPTS_PER_THREAD // 2
+    product = ProductFactory(quantity=stock, category=category)
+    users = UserFactory.create_batch(THREADS)
+    refused = []
+
+    def reserve_one_at_a_time(user):
+        for _ in range(ATTEMPTS_PER_THREAD):
+            try:
+                reserve(user, deltas={product.pk: 1})
+            except OutOfStockError:
+                refused.append(user.pk)
+
+    run_in_parallel([partial(reserve_one_at_a_time, user) for user in users])
+
+    product.refresh_from_db()
+    assert product.quantity == 0
+    assert sum(product.reservations.values_list("quantity", flat=True)) == stock
+    assert len(refused) == THREADS * ATTEMPTS_PER_THREAD - stock
+
+
+# The cart views run outside a request transaction, the error response
+# would mark the transaction of the test for rollback.
+@pytest.mark.django_db(transaction=True)
+def test_add_to_cart_reserves_stock(user, category):
+    product = ProductFactory(quantity=3, category=category)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        "/api/cart/",
+        {"product_id": product.pk, "quantity": 2},
+        format="json",
+    )
+    assert response.status_code == 201  # noqa: PLR2004
+
+    response = client.post(
+        "/api/cart/",
+        {"product_id": product.pk, "quantity": 2},
+        format="json",
+    )
+    assert response.status_code == 400  # noqa: PLR2004
+
+    client.post("/api/cart/remove-item/", {"product_id": product.pk}, format="json")
+    product.refresh_from_db()
+    assert product.quantity == 3  # noqa: PLR2004
+    assert not held(user)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_add_to_cart_commits_the_reservation_first(user, category, monkeypatch):
+    product = ProductFactory(quantity=3, category=category)
+    in_transaction = []
+    add = DatabaseCartStore.add
+
+    def add_to_cart(self, *args):
+        in_transaction.append(connection.in_atomic_block)
+        return add(self, *args)
+
+    monkeypatch.setattr(DatabaseCartStore, "add", add_to_cart)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        "/api/cart/",
+        {"product_id": product.pk, "quantity": 2},
+        format="json",
+    )
+
+    assert response.status_code == 201  # noqa: PLR2004
+    # The product row was unlocked before the cart was written.
+    assert in_transaction == [False]
+    assert held(user) == {product.pk: 2}
+
+
+def test_take_stock_of_nothing():
+    assert Product.objects.take_stock({}) == {}
+
+
+def test_cart_changes_keep_the_list_cache(
+    user,
+    category,
+    django_capture_on_commit_callbacks,
+):
+    product = ProductFactory(quantity=3, category=category)
+    catalog = get_version(CATALOG_VERSION_KEY)
+    detail = get_version(PRODUCT_VERSION_KEY.format(pk=product.pk))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reserve(user, deltas={product.pk: 2})
+    assert get_version(CATALOG_VERSION_KEY) == catalog
+    assert get_version(PRODUCT_VERSION_KEY.format(pk=product.pk)) != detail
+
+    # Selling out and coming back both change what lists show.
+    with django_capture_on_commit_callbacks(execute=True):
+        reserve(user, deltas={product.pk: 1})
+    assert get_version(CATALOG_VERSION_KEY) != catalog
+    catalog = get_version(CATALOG_VERSION_KEY)
+    with django_capture_on_commit_callbacks(execute=True):
+        release(user)
+    assert get_version(CATALOG_VERSION_KEY) != catalog
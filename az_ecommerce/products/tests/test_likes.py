@@ -0,0 +1,188 @@
+from importlib import import_module
+from io import StringIO
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.cache import CATALOG_VERSION_KEY
+from az_ecommerce.products.cache import PRODUCT_VERSION_KEY
+from az_ecommerce.products.cache import get_version
+from az_ecommerce.products.counters import FLUSH_LOCK_KEY
+from az_ecommerce.products.counters import LIKE_DELTAS_KEY
+from az_ecommerce.products.counters import FlushInProgressError
+from az_ecommerce.products.counters import flush_like_counts
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def redis(redis, settings):
+    settings.LIKE_COUNT_BUFFERING = True
+    return redis
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def like_count(product):
+    return Product.objects.values_list("like_count", flat=True).get(pk=product.pk)
+
+
+def test_like_is_idempotent(client, product, django_capture_on_commit_callbacks):
+    url = f"/api/products/{product.pk}/like/"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.post(url).status_code == 201  # noqa: PLR2004
+        assert client.post(url).status_code == 200  # noqa: PLR2004
+    assert like_count(product) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.delete(url).status_code == 204  # noqa: PLR2004
+        assert client.delete(url).status_code == 204  # noqa: PLR2004
+    assert like_count(product) == 0
+    assert not Like.objects.exists()
+
+
+def test_like_keeps_the_list_cache(
+    client,
+    product,
+    django_capture_on_commit_callbacks,
+):
+    catalog = get_version(CATALOG_VERSION_KEY)
+    detail = get_version(PRODUCT_VERSION_KEY.format(pk=product.pk))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(f"/api/products/{product.pk}/like/")
+
+    assert get_version(CATALOG_VERSION_KEY) == catalog
+    assert get_version(PRODUCT_VERSION_KEY.format(pk=product.pk)) != detail
+
+
+def test_buffered_likes_wait_for_the_flush(
+    redis,
+    product,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        for user in UserFactory.create_batch(3):
+            Like.objects.add(user, product)
+        Like.objects.filter(user=user).delete()
+    assert like_count(product) == 0
+
+    assert flush_like_counts() == 1
+    assert like_count(product) == 2  # noqa: PLR2004
+    assert flush_like_counts() == 0
+    assert like_count(product) == 2  # noqa: PLR2004
+
+
+def test_flush_does_not_overlap(redis, product, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        Like.objects.add(UserFactory(), product)
+    redis.set(FLUSH_LOCK_KEY, b"another flush")
+
+    with pytest.raises(FlushInProgressError):
+        flush_like_counts()
+    stdout = StringIO()
+    call_command("flush_like_counts", stdout=stdout)
+
+    assert "Another flush is running" in stdout.getvalue()
+    assert like_count(product) == 0
+    assert redis.hgetall(LIKE_DELTAS_KEY) == {str(product.pk).encode(): b"1"}
+    redis.delete(FLUSH_LOCK_KEY)
+    assert flush_like_counts() == 1
+    assert like_count(product) == 1
+    assert not redis.exists(FLUSH_LOCK_KEY)
+
+
+def test_rebuild_command_recounts_likes(redis, product):
+    for user in UserFactory.create_batch(2):
+        Like.objects.add(user, product)
+    Product.objects.update(like_count=7)
+    redis.hincrby(LIKE_DELTAS_KEY, product.pk, 5)
+
+    call_command("rebuild_like_counts", batch_size=1, stdout=StringIO())
+
+    assert like_count(product) == 2  # noqa: PLR2004
+    assert not redis.exists(LIKE_DELTAS_KEY)
+
+
+def test_migration_backfills_like_counts(product):
+    Like.objects.add(UserFactory(), product)
+    Product.objects.update(like_count=0)
+    migration = import_module(
+        "az_ecommerce.products.migrations.0006_product_like_count",
+    )
+
+    with connection.schema_editor() as schema_editor:
+        migration.backfill_like_counts(apps, schema_editor)
+
+    assert like_count(product) == 1
+
+
+def test_bulk_like_and_unlike(
+    client,
+    user,
+    category,
+    django_capture_on_commit_callbacks,
+):
+    products = ProductFactory.create_batch(3, category=category)
+    ids = [product.pk for product in products]
+    Favorites.objects.add(user, products[0])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            "/api/products/bulk/",
+            {"operation": "like", "product_ids": ids},
+            format="json",
+        )
+    assert response.json() == {"liked_ids": ids, "favorited_ids": ids}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            "/api/products/bulk/",
+            {"operation": "like", "product_ids": ids[:2]},
+            format="json",
+        )
+        response = client.post(
+            "/api/products/bulk/",
+            {"operation": "unlike", "product_ids": ids[1:]},
+            format="json",
+        )
+    assert response.json() == {"liked_ids": [], "favorited_ids": []}
+    assert [like_count(product) for product in products] == [1, 0, 0]
+
+
+def test_bulk_rejects_unknown_products(client, product):
+    response = client.post(
+        "/api/products/bulk/",
+        {"operation": "favorite", "product_ids": [product.pk, 0, product.pk + 1000]},
+        format="json",
+    )
+
+    assert response.status_code == 400  # noqa: PLR2004
+    assert not Favorites.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_bulk_likes_count_once(user, category, run_in_parallel):
+    products = ProductFactory.create_batch(5, category=category)
+
+    def like():
+        Like.objects.bulk_add(user, products)
+
+    run_in_parallel([like] * 4)
+
+    assert Like.objects.count() == len(products)
+    assert [like_count(product) for product in products] == [1] * len(products)
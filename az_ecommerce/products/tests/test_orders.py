@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+import pytest
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.inventory import reserve
+from az_ecommerce.products.models import Cart
+from az_ecommerce.products.models import CartItem
+from az_ecommerce.products.models import Order
+from az_ecommerce.products.models import Reservation
+from az_ecommerce.products.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+THREADS = 6
+
+
+@pytest.fixture
+def products(category):
+    return [
+        ProductFactory(
+            title=f"Shirt {i}",
+            price=Decimal("10.50") * (i + 1),
+            category=category,
+        )
+        for i in range(2)
+    ]
+
+
+@pytest.fixture
+def cart(user, products):
+    cart = Cart.objects.create(user=user)
+    quantities = {products[0].pk: 2, products[1].pk: 1}
+    reserve(user, deltas=quantities)
+    CartItem.objects.bulk_add(cart, quantities)
+    return cart
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def test_order_copies_the_cart(client, user, cart, products):
+    response = client.post("/api/orders/", HTTP_IDEMPOTENCY_KEY="first")
+
+    assert response.status_code == 201  # noqa: PLR2004
+    body = response.json()
+    assert body["total"] == "42.00"
+    assert [(item["title"], item["price"]) for item in body["items"]] == [
+        ("Shirt 0", "10.50"),
+        ("Shirt 1", "21.00"),
+    ]
+    assert not cart.items.exists()
+    assert not Reservation.objects.exists()
+    products[0].refresh_from_db()
+    assert products[0].quantity == 8  # noqa: PLR2004
+
+
+def test_retry_returns_the_stored_order(client, cart):
+    first = client.post("/api/orders/", HTTP_IDEMPOTENCY_KEY="retry-me")
+    retry = client.post("/api/orders/", HTTP_IDEMPOTENCY_KEY="retry-me")
+
+    assert retry.status_code == 201  # noqa: PLR2004
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert Order.objects.count() == 1
+
+
+def test_key_reused_for_another_request(client, cart):
+    client.post("/api/orders/", {"note": "a"}, format="json", HTTP_IDEMPOTENCY_KEY="k")
+
+    response = client.post(
+        "/api/orders/",
+        {"note": "b"},
+        format="json",
+        HTTP_IDEMPOTENCY_KEY="k",
+    )
+
+    assert response.status_code == 422  # noqa: PLR2004
+
+
+def test_empty_cart(client, user):
+    response = client.post("/api/orders/")
+
+    assert response.status_code == 400  # noqa: PLR2004
+    assert not Order.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_retries_place_one_order(user, cart, run_in_parallel):
+    statuses = []
+
+    def submit():
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post("/api/orders/", HTTP_IDEMPOTENCY_KEY="flaky")
+        statuses.append(response.status_code)
+
+    run_in_parallel([submit] * THREADS)
+
+    assert Order.objects.count() == 1
+    assert statuses == [201] * THREADS
@@ -0,0 +1,395 @@
+import json
+from base64 import urlsafe_b64encode
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import CategoryFactory
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.products.utils import get_user_product_flags
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def products(category):
+    return ProductFactory.create_batch(10, category=category)
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def count_queries(client, path, params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path, params)
+    assert response.status_code == 200  # noqa: PLR2004
+    return len(queries)
+
+
+def test_flags_of_a_page_take_one_query(user, products, django_assert_num_queries):
+    Like.objects.add(user, products[0])
+    Favorites.objects.add(user, products[1])
+    Favorites.objects.add(user, products[0])
+
+    with django_assert_num_queries(1):
+        flags = get_user_product_flags(user, [product.pk for product in products])
+
+    assert flags == {
+        "liked_ids": {products[0].pk},
+        "favorited_ids": {products[0].pk, products[1].pk},
+    }
+
+
+def test_anonymous_flags_take_no_query(products, django_assert_num_queries):
+    client = APIClient()
+    client.get("/api/products/")
+
+    # Only the savepoint pair of ATOMIC_REQUESTS.
+    with django_assert_num_queries(2):
+        body = client.get("/api/products/").json()
+
+    assert not any(item["is_liked"] for item in body["results"])
+
+
+def test_list_flags_do_not_grow_with_the_page(client, user, products):
+    Like.objects.add(user, products[-1])
+    Favorites.objects.add(user, products[-2])
+
+    # Facets are shared by every page size, have them cached first.
+    client.get("/api/products/", {"page_size": 1})
+    small = count_queries(client, "/api/products/", {"page_size": 2})
+    large = count_queries(client, "/api/products/", {"page_size": 10})
+
+    assert small == large
+    results = client.get("/api/products/", {"page_size": 2}).json()["results"]
+    assert [(item["is_liked"], item["is_favorited"]) for item in results] == [
+        (True, False),
+        (False, True),
+    ]
+
+
+def walk(client, url, direction):
+    pages = []
+    while url:
+        body = client.get(url).json()
+        pages.append([item["id"] for item in body["results"]])
+        url = body[direction]
+    return pages
+
+
+@pytest.mark.parametrize("ordering", ["-id", "price", "-price", "title"])
+def test_cursor_walks_both_ways(client, category, ordering):
+    # Equal prices and titles, the primary key breaks the ties.
+    for i in range(7):
+        ProductFactory(title=f"Shirt {i % 2}", price=10 + i % 3, category=category)
+    url = f"/api/products/?page_size=3&ordering={ordering}"
+
+    forward = walk(client, url, "next")
+    last = client.get(url).json()
+    while last["next"]:
+        last = client.get(last["next"]).json()
+    backward = walk(client, last["previous"], "previous")
+
+    assert [len(page) for page in forward] == [3, 3, 1]
+    ids = [pk for page in forward for pk in page]
+    assert len(set(ids)) == 7  # noqa: PLR2004
+    assert backward == forward[-2::-1]
+
+
+def cursor(payload):
+    encoded = urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    return encoded.rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "position",
+    [["abc", 1], [None, 1], [10, "x"], [[1], 1], [10]],
+)
+def test_malformed_cursor_is_not_found(client, products, position):
+    response = client.get(
+        "/api/products/",
+        {"ordering": "price", "cursor": cursor({"o": "price", "p": position, "r": 0})},
+    )
+
+    assert response.status_code == 404  # noqa: PLR2004
+
+
+def test_malformed_review_cursor_is_not_found(client, product):
+    payload = {"o": "-created_at", "p": ["yesterday", 1], "r": 0}
+
+    response = client.get(
+        f"/api/products/{product.pk}/reviews/",
+        {"cursor": cursor(payload)},
+    )
+
+    assert response.status_code == 404  # noqa: PLR2004
+
+
+@pytest.fixture
+def searchable(category):
+    return {
+        "title": ProductFactory(title="Linen blazer", category=category),
+        "description": ProductFactory(
+            title="Jacket",
+            description="Light linen weave",
+            category=category,
+        ),
+        "category": ProductFactory(
+            title="Trousers",
+            category=CategoryFactory(name="Linen"),
+        ),
+        "other": ProductFactory(title="Wool coat", category=category),
+    }
+
+
+def test_search_ranks_title_then_description_then_category(client, searchable):
+    body = client.get("/api/products/", {"search": "linens"}).json()
+
+    assert [item["id"] for item in body["results"]] == [
+        searchable["title"].pk,
+        searchable["description"].pk,
+        searchable["category"].pk,
+    ]
+
+
+def test_search_pages_by_relevance(client, searchable):
+    pages = walk(client, "/api/products/?search=linen&page_size=1", "next")
+
+    assert pages == [
+        [searchable["title"].pk],
+        [searchable["description"].pk],
+        [searchable["category"].pk],
+    ]
+
+
+def test_search_follows_category_renames(client, searchable):
+    category = searchable["category"].category
+    category.name = "Cotton"
+    category.save()
+
+    body = client.get("/api/products/", {"search": "cotton"}).json()
+
+    assert [item["id"] for item in body["results"]] == [searchable["category"].pk]
+
+
+def test_product_save_writes_its_search_vector(
+    searchable,
+    django_assert_num_queries,
+):
+    product = searchable["other"]
+    product.title = "Linen coat"
+
+    with django_assert_num_queries(1):
+        product.save()
+
+    assert Product.objects.filter(search_vector="linen").count() == 4  # noqa: PLR2004
+    product.quantity = 5
+    product.save(update_fields=["quantity"])
+    assert "linen" in str(Product.objects.get(pk=product.pk).search_vector)
+
+
+def test_category_saves_without_rename_leave_products_alone(searchable):
+    category = Category.objects.get(pk=searchable["category"].category_id)
+
+    with CaptureQueriesContext(connection) as queries:
+        category.save()
+        category.move_to(None)
+
+    assert not [query for query in queries if "products_product" in query["sql"]]
+
+
+def test_migration_backfills_search_vectors(searchable):
+    Product.objects.update(search_vector=None)
+    migration = import_module(
+        "az_ecommerce.products.migrations.0003_product_search_vector",
+    )
+
+    with connection.schema_editor() as schema_editor:
+        migration.backfill_search_vectors(apps, schema_editor)
+
+    assert not Product.objects.filter(search_vector=None).exists()
+    assert Product.objects.filter(search_vector="linen").count() == 3  # noqa: PLR2004
+
+
+def test_category_filter_includes_the_subtree(client, django_assert_max_num_queries):
+    men = CategoryFactory(name="Men")
+    shirts = CategoryFactory(name="Shirts", parent=men)
+    formal = CategoryFactory(name="Formal", parent=shirts)
+    women = CategoryFactory(name="Women")
+    in_men = ProductFactory(category=men)
+    in_shirts = ProductFactory(category=shirts)
+    in_formal = ProductFactory(category=formal)
+    ProductFactory(category=women)
+
+    def ids(category):
+        body = client.get("/api/products/", {"category": category.pk}).json()
+        return {item["id"] for item in body["results"]}
+
+    assert ids(shirts) == {in_shirts.pk, in_formal.pk}
+    # Still one range however deep the tree: the category itself, the page,
+    # the facets, the flags and the savepoint pair.
+    with django_assert_max_num_queries(6):
+        assert ids(men) == {in_men.pk, in_shirts.pk, in_formal.pk}
+    assert ids(formal) == {in_formal.pk}
+
+
+def test_unknown_category_is_rejected(client, products):
+    response = client.get("/api/products/", {"category": 0})
+
+    assert response.status_code == 400  # noqa: PLR2004
+
+
+def test_detail_is_served_from_the_cache(
+    client,
+    user,
+    product,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    url = f"/api/products/{product.pk}/"
+    client.get(url)
+    Like.objects.add(user, product)
+
+    # The savepoint pair and the user's flags over the cached body.
+    with django_assert_num_queries(3):
+        body = client.get(url).json()
+    assert body["is_liked"] is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product.title = "Oxford shirt"
+        product.save()
+    assert client.get(url).json()["title"] == "Oxford shirt"
+
+
+def test_list_is_served_from_the_cache(
+    products,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    client = APIClient()
+    client.get("/api/products/")
+
+    with django_assert_num_queries(2):
+        client.get("/api/products/")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        products[-1].delete()
+    body = client.get("/api/products/").json()
+    assert body["results"][0]["id"] == products[-2].pk
+
+
+def test_unchanged_detail_is_not_modified(
+    client,
+    user,
+    product,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    url = f"/api/products/{product.pk}/"
+    etag = client.get(url)["ETag"]
+
+    # Answered from the version counters, only the savepoint pair is left.
+    with django_assert_num_queries(2):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304  # noqa: PLR2004
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Like.objects.add(user, product)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response.json()["is_liked"] is True
+    etag = response["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product.price = 12
+        product.save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200  # noqa: PLR2004
+
+
+def test_unchanged_list_is_not_modified(products, django_capture_on_commit_callbacks):
+    client = APIClient()
+    response = client.get("/api/products/")
+
+    etag = response["ETag"]
+    response = client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304  # noqa: PLR2004
+    # Another query has another tag.
+    response = client.get("/api/products/?ordering=price", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200  # noqa: PLR2004
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductFactory(category=products[0].category)
+    response = client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("pk", ["²", "\N{ARABIC-INDIC DIGIT ONE}", "abc"])
+def test_detail_of_a_non_decimal_id_is_not_found(client, pk):
+    assert client.get(f"/api/products/{pk}/").status_code == 404  # noqa: PLR2004
+
+
+@pytest.fixture
+def catalog(category):
+    other = CategoryFactory(name="Coats")
+    return [
+        ProductFactory(size="small", color="red", price=20, category=category),
+        ProductFactory(size="small", color="blue", price=30, category=category),
+        ProductFactory(size="large", color="red", price=80, category=category),
+        ProductFactory(size="large", color="red", price=600, category=other),
+    ]
+
+
+def test_facets_count_the_filtered_products(client, catalog, category):
+    body = client.get("/api/products/", {"color": "red", "page_size": 1}).json()
+
+    assert len(body["results"]) == 1
+    assert body["facets"] == {
+        "size": [{"value": "large", "count": 2}, {"value": "small", "count": 1}],
+        "color": [{"value": "red", "count": 3}],
+        "category": [
+            {"value": category.pk, "count": 2},
+            {"value": catalog[3].category_id, "count": 1},
+        ],
+        "price": [
+            {"min": None, "max": 25, "count": 1},
+            {"min": 50, "max": 100, "count": 1},
+            {"min": 500, "max": None, "count": 1},
+        ],
+    }
+
+
+def test_filters_combine(client, catalog):
+    body = client.get(
+        "/api/products/",
+        {"size": ["small", "large"], "color": "red,blue", "price_max": 50},
+    ).json()
+
+    assert {item["id"] for item in body["results"]} == {
+        catalog[0].pk,
+        catalog[1].pk,
+    }
+    assert body["facets"]["price"] == [
+        {"min": None, "max": 25, "count": 1},
+        {"min": 25, "max": 50, "count": 1},
+    ]
+
+
+def test_facets_are_shared_by_all_pages(client, catalog, django_assert_num_queries):
+    body = client.get("/api/products/", {"page_size": 2}).json()
+
+    # The next page reads its rows, the facets come from the cache.
+    with django_assert_num_queries(4):
+        page = client.get(body["next"]).json()
+    assert page["facets"] == body["facets"]
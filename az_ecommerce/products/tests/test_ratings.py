@@ -0,0 +1,109 @@
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.models import Rating
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+SUMMARY_FIELDS = [
+    "rating_count",
+    "rating_sum",
+    "rating_avg",
+    "star_1_count",
+    "star_2_count",
+    "star_3_count",
+    "star_4_count",
+    "star_5_count",
+]
+
+
+def summary(product):
+    return Product.objects.values(*SUMMARY_FIELDS).get(pk=product.pk)
+
+
+def test_summary_follows_ratings(product):
+    first = Rating.objects.create(user=UserFactory(), product=product, score=5)
+    Rating.objects.create(user=UserFactory(), product=product, score=2)
+
+    assert summary(product) == {
+        "rating_count": 2,
+        "rating_sum": 7,
+        "rating_avg": Decimal("3.5"),
+        "star_1_count": 0,
+        "star_2_count": 1,
+        "star_3_count": 0,
+        "star_4_count": 0,
+        "star_5_count": 1,
+    }
+
+    first.score = 1
+    first.save()
+    assert summary(product)["rating_sum"] == 3  # noqa: PLR2004
+    assert summary(product)["star_5_count"] == 0
+
+    first.delete()
+    assert summary(product)["rating_count"] == 1
+    assert summary(product)["rating_avg"] == Decimal("2.0")
+
+
+def test_moving_a_rating_updates_both_products(product):
+    other = ProductFactory(category=product.category)
+    rating = Rating.objects.create(user=UserFactory(), product=product, score=4)
+
+    rating.product = other
+    rating.save()
+
+    assert summary(product)["rating_count"] == 0
+    assert summary(product)["rating_avg"] is None
+    assert summary(other)["star_4_count"] == 1
+
+
+def test_saving_a_deferred_rating_counts_it_once(product):
+    rating = Rating.objects.create(user=UserFactory(), product=product, score=4)
+
+    deferred = Rating.objects.only("id", "review").get(pk=rating.pk)
+    deferred.review = "Fine"
+    deferred.save()
+    deferred = Rating.objects.defer("score").get(pk=rating.pk)
+    deferred.score = 2
+    deferred.save()
+
+    assert summary(product)["rating_count"] == 1
+    assert summary(product)["rating_sum"] == 2  # noqa: PLR2004
+    assert summary(product)["star_4_count"] == 0
+
+
+def test_rebuild_command_fixes_drift(product):
+    Rating.objects.create(user=UserFactory(), product=product, score=3)
+    Rating.objects.create(user=UserFactory(), product=product, score=4)
+    expected = summary(product)
+    Product.objects.update(rating_count=9, rating_sum=0, star_3_count=5)
+
+    call_command("rebuild_rating_summaries", batch_size=1, stdout=StringIO())
+
+    assert summary(product) == expected
+
+
+def test_migration_backfills_existing_ratings(product):
+    Rating.objects.create(user=UserFactory(), product=product, score=5)
+    Rating.objects.create(user=UserFactory(), product=product, score=4)
+    expected = summary(product)
+    Product.objects.update(rating_count=0, rating_sum=0, rating_avg=None)
+    Product.objects.update(star_4_count=0, star_5_count=0)
+    migration = import_module(
+        "az_ecommerce.products.migrations.0002_product_rating_summary",
+    )
+
+    with connection.schema_editor() as schema_editor:
+        migration.backfill_rating_summaries(apps, schema_editor)
+
+    assert summary(product) == expected
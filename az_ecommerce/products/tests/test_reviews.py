@@ -0,0 +1,67 @@
+import pytest
+from rest_framework.test import APIClient
+
+from az_ecommerce.products.models import Rating
+from az_ecommerce.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def ratings(product):
+    scores = [5, 4, 4, 1, 5]
+    return [
+        Rating.objects.create(
+            user=UserFactory(),
+            product=product,
+            score=score,
+            review="" if i == 2 else f"Review {i}",  # noqa: PLR2004
+        )
+        for i, score in enumerate(scores)
+    ]
+
+
+def test_reviews_newest_first_with_summary(
+    product,
+    ratings,
+    django_assert_num_queries,
+):
+    client = APIClient()
+
+    # The product's summary row and one page of reviews with their users.
+    with django_assert_num_queries(4):
+        page = client.get(f"/api/products/{product.pk}/reviews/", {"page_size": 2})
+    body = page.json()
+
+    assert body["summary"] == {
+        "count": 5,
+        "average": 3.8,
+        "histogram": {"1": 1, "2": 0, "3": 0, "4": 2, "5": 2},
+    }
+    assert [review["review"] for review in body["results"]] == ["Review 4", "Review 3"]
+    assert body["results"][0]["user"] == ratings[4].user.name
+
+    body = client.get(body["next"]).json()
+    # The rating without a review is left out.
+    assert [review["review"] for review in body["results"]] == ["Review 1", "Review 0"]
+    assert body["next"] is None
+
+
+def test_reviews_with_equal_timestamps(product, ratings):
+    Rating.objects.update(created_at=ratings[0].created_at)
+    client = APIClient()
+    seen = []
+    url = f"/api/products/{product.pk}/reviews/?page_size=1"
+    while url:
+        body = client.get(url).json()
+        seen.extend(review["id"] for review in body["results"])
+        url = body["next"]
+
+    assert seen == sorted(
+        (rating.pk for rating in ratings if rating.review),
+        reverse=True,
+    )
+
+
+def test_reviews_of_unknown_product(db):
+    assert APIClient().get("/api/products/0/reviews/").status_code == 404  # noqa: PLR2004
@@ -0,0 +1,134 @@
+from io import BytesIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.http import HttpResponseForbidden
+from django.test import Client
+from django.test import RequestFactory
+from PIL import Image
+
+from az_ecommerce.products.models import Product
+from az_ecommerce.products.tests.factories import CategoryFactory
+from az_ecommerce.products.tests.factories import ProductFactory
+from az_ecommerce.products.uploads import ImageUploadHandler
+
+pytestmark = pytest.mark.django_db
+
+
+def image_bytes(width, height, image_format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def make_product(image):
+    return ProductFactory.build(image=image, category=CategoryFactory())
+
+
+def image_errors(image):
+    with pytest.raises(ValidationError) as error:
+        make_product(image).full_clean()
+    return [e.code for e in error.value.error_dict["image"]]
+
+
+def test_valid_image_is_accepted():
+    make_product(SimpleUploadedFile("shirt.png", image_bytes(40, 20))).full_clean()
+
+
+def test_stored_image_is_not_opened():
+    make_product("products_images/missing.jpg").full_clean()
+
+
+def test_non_image_is_rejected():
+    upload = SimpleUploadedFile("shirt.png", b"<?php echo 'hi'; ?>")
+    assert image_errors(upload) == ["invalid_image"]
+
+
+def test_unsupported_format_is_rejected():
+    upload = SimpleUploadedFile("shirt.bmp", image_bytes(40, 20, "BMP"))
+    assert image_errors(upload) == ["invalid_image_format"]
+
+
+def test_large_dimensions_are_rejected(settings):
+    settings.IMAGE_UPLOAD_MAX_DIMENSION = 30
+    upload = SimpleUploadedFile("shirt.png", image_bytes(40, 20))
+    assert image_errors(upload) == ["image_too_big"]
+
+
+def test_upload_past_the_limit_is_not_read(settings):
+    settings.IMAGE_UPLOAD_MAX_SIZE = 1024
+    content = image_bytes(40, 20) + b"\0" * 64 * 1024
+    request = RequestFactory().post(
+        "/",
+        {
+            "title": "Shirt",
+            "image": SimpleUploadedFile("shirt.png", content),
+            "color": "red",
+        },
+    )
+    request.upload_handlers = [ImageUploadHandler(request)]
+
+    assert "image" not in request.FILES
+    # The fields before the upload are kept, the body after it is not read.
+    assert request.POST.get("title") == "Shirt"
+    assert "color" not in request.POST
+
+
+def test_upload_within_the_limit_is_kept(settings):
+    content = image_bytes(40, 20)
+    request = RequestFactory().post(
+        "/",
+        {"image": SimpleUploadedFile("shirt.png", content)},
+    )
+    request.upload_handlers = [ImageUploadHandler(request)]
+
+    upload = request.FILES["image"]
+
+    assert isinstance(upload, TemporaryUploadedFile)
+    assert upload.read() == content
+    make_product(upload).full_clean()
+
+
+def test_admin_rejects_a_large_upload(admin_client, settings):
+    settings.IMAGE_UPLOAD_MAX_SIZE = 1024
+    category = CategoryFactory()
+    content = image_bytes(40, 20) + b"\0" * 64 * 1024
+
+    response = admin_client.post(
+        "/admin/products/product/add/",
+        {
+            "title": "Shirt",
+            "description": "A shirt",
+            "price": "10",
+            "color": "red",
+            "quantity": "1",
+            "category": category.pk,
+            "image": SimpleUploadedFile("shirt.png", content),
+        },
+    )
+
+    assert response.status_code == 200  # noqa: PLR2004
+    # Stopped by the handler before the validators could see it.
+    errors = response.context["adminform"].form.errors.as_data()
+    assert [e.code for e in errors["image"]] == ["required"]
+    assert not Product.objects.exists()
+
+
+def csrf_failure(request, reason=""):
+    return HttpResponseForbidden(reason)
+
+
+def test_admin_image_views_check_csrf(admin_user, settings):
+    settings.CSRF_FAILURE_VIEW = f"{__name__}.csrf_failure"
+    client = Client(enforce_csrf_checks=True)
+    client.force_login(admin_user)
+
+    response = client.post(
+        "/admin/products/product/add/",
+        {"image": SimpleUploadedFile("shirt.png", image_bytes(40, 20))},
+    )
+
+    assert response.status_code == 403  # noqa: PLR2004
+    assert not Product.objects.exists()
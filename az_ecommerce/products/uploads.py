@@ -0,0 +1,68 @@
+"""
+Image upload ingestion.
+
+``ImageUploadHandler`` streams an upload to a temporary file in chunks, so
+the request never holds a whole image in memory, and stops the upload as
+soon as it is past ``IMAGE_UPLOAD_MAX_SIZE`` without reading the rest. It
+is installed by the admin views that take images, see ``products.admin``.
+``validate_image_upload`` then rejects uploads that came in any other way
+by their size, and checks the type and dimensions of the rest from the
+image header alone, without decoding any pixels. Stored files are streamed
+from the temporary file to the storage.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import StopUpload
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from PIL import UnidentifiedImageError
+
+IMAGE_UPLOAD_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, field_name, file_name, content_type, content_length, *args):
+        # Clients rarely send the size of each file, when they do a too
+        # large one is refused before anything is written.
+        if content_length and content_length > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise StopUpload(connection_reset=True)
+        super().new_file(field_name, file_name, content_type, content_length, *args)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # The rest of the request body is not read, the partial file is
+        # dropped and the form sees no upload.
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+
+
+def validate_image_upload(value):
+    # Files already in the storage were checked when they were uploaded.
+    if getattr(value, "_committed", False):
+        return
+    max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+    if value.size > max_size:
+        msg = f"Images can be at most {max_size // (1024 * 1024)} MB."
+        raise ValidationError(msg, code="image_too_large")
+
+    value.seek(0)
+    try:
+        # Opening only parses the header, pixels are decoded on first use.
+        with Image.open(value) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        msg = "Upload a valid image."
+        raise ValidationError(msg, code="invalid_image") from None
+    finally:
+        value.seek(0)
+
+    if image_format not in IMAGE_UPLOAD_FORMATS:
+        msg = f"Images must be one of {', '.join(sorted(IMAGE_UPLOAD_FORMATS))}."
+        raise ValidationError(msg, code="invalid_image_format")
+    max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if width > max_dimension or height > max_dimension:
+        msg = f"Images can be at most {max_dimension}px wide and high."
+        raise ValidationError(msg, code="image_too_big")
@@ -5,6 +5,8 @@ from rest_framework.routers import SimpleRouter
 from az_ecommerce.products.api.views import (
     CartViewSet,
     CategoryViewSet,
+    ExportViewSet,
+    OrderViewSet,
     ProductViewSet,
     FavoritesViewSet
 )
@@ -15,6 +17,8 @@ router.register("categories", CategoryViewSet)
 router.register("products", ProductViewSet)
 router.register("favorites", FavoritesViewSet)
 router.register("cart", CartViewSet, basename="cart")
+router.register("orders", OrderViewSet, basename="order")
+router.register("exports", ExportViewSet, basename="export")
 
 
 
@@ -0,0 +1,133 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField
+from django.db.models import Value
+
+from az_ecommerce.products.cache import CATEGORY_TREE_KEY
+from az_ecommerce.products.cache import CATEGORY_TREE_VERSION_KEY
+from az_ecommerce.products.cache import VERSION_TIMEOUT
+from az_ecommerce.products.cache import bump_version
+from az_ecommerce.products.cache import get_version
+from az_ecommerce.products.favorites import get_favorite_ids
+from az_ecommerce.products.images import image_srcset
+from az_ecommerce.products.models import Category
+from az_ecommerce.products.models import Favorites
+from az_ecommerce.products.models import Like
+
+LIKED = "liked"
+FAVORITED = "favorited"
+
+
+def parse_pk(value):
+    """Return ``value`` as an int if it is made of ASCII digits, else None."""
+    # Not str.isdigit(), which also accepts digits int() cannot parse.
+    if re.fullmatch(r"[0-9]+", value):
+        return int(value)
+    return None
+
+
+def get_user_product_flags(user, product_ids):
+    """
+    Return which of ``product_ids`` the user liked and favorited.
+
+    Both sets are read with a single UNION query no matter how many
+    products are passed in, anonymous users cost no query at all. With
+    ``FAVORITE_IDS_CACHE`` on, the favorites come from the user's cached
+    set instead.
+    """
+    flags = {"liked_ids": set(), "favorited_ids": set()}
+    product_ids = list(product_ids)
+    if not product_ids or not user.is_authenticated:
+        return flags
+
+    if settings.FAVORITE_IDS_CACHE:
+        flags["liked_ids"] = set(
+            Like.objects.filter(user=user, product_id__in=product_ids).values_list(
+                "product_id",
+                flat=True,
+            ),
+        )
+        flags["favorited_ids"] = get_favorite_ids(user).intersection(product_ids)
+        return flags
+
+    liked = Like.objects.filter(user=user, product_id__in=product_ids).values_list(
+        "product_id",
+        Value(LIKED, output_field=CharField()),
+    )
+    favorited = Favorites.objects.filter(
+        user=user,
+        product_id__in=product_ids,
+    ).values_list("product_id", Value(FAVORITED, output_field=CharField()))
+    for product_id, kind in liked.union(favorited, all=True):
+        flags["liked_ids" if kind == LIKED else "favorited_ids"].add(product_id)
+    return flags
+
+
+def apply_user_product_flags(user, items):
+    """
+    Layer ``is_liked`` and ``is_favorited`` over serialized products.
+
+    Used on response bodies that were cached without per-user fields.
+    """
+    flags = get_user_product_flags(user, [item["id"] for item in items])
+    return [
+        {
+            **item,
+            "is_liked": item["id"] in flags["liked_ids"],
+            "is_favorited": item["id"] in flags["favorited_ids"],
+        }
+        for item in items
+    ]
+
+
+def build_category_tree():
+    """
+    Build the nested category tree from one query.
+
+    Rows come in MPTT tree order, so every parent is already in place when
+    its children are reached.
+    """
+    storage = Category.image.field.storage
+    nodes = {}
+    roots = []
+    rows = Category.objects.order_by("tree_id", "lft").values(
+        "id",
+        "name",
+        "image",
+        "image_variants",
+        "parent_id",
+    )
+    for row in rows:
+        node = {
+            "id": row["id"],
+            "name": row["name"],
+            "image": storage.url(row["image"]) if row["image"] else None,
+            "image_srcset": image_srcset(
+                storage,
+                row["image"],
+                row["image_variants"],
+            ),
+            "children": [],
+        }
+        nodes[row["id"]] = node
+        if row["parent_id"] is None:
+            roots.append(node)
+        else:
+            nodes[row["parent_id"]]["children"].append(node)
+    return roots
+
+
+def get_category_tree():
+    key = CATEGORY_TREE_KEY.format(version=get_version(CATEGORY_TREE_VERSION_KEY))
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        # Trees of old versions are never read again, let them expire.
+        cache.set(key, tree, timeout=VERSION_TIMEOUT)
+    return tree
+
+
+def invalidate_category_tree():
+    bump_version(CATEGORY_TREE_VERSION_KEY)
@@ -3,6 +3,7 @@ from typing import Any
 
 from factory import Faker
 from factory import post_generation
+from factory import sequence
 from factory.django import DjangoModelFactory
 
 from az_ecommerce.users.models import User
@@ -12,6 +13,11 @@ class UserFactory(DjangoModelFactory[User]):
     email = Faker("email")
     name = Faker("name")
 
+    @sequence
+    def phone(n: int) -> str:  # noqa: N805
+        # Unique, unlike the blank default.
+        return f"+2010{n:08d}"
+
     @post_generation
     def password(self, create: bool, extracted: Sequence[Any], **kwargs):  # noqa: FBT001
         password = (
@@ -69,6 +69,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -161,6 +162,9 @@ STATICFILES_FINDERS = [
 MEDIA_ROOT = str(APPS_DIR / "media")
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "/media/"
+# Image uploads are checked by products.uploads.
+IMAGE_UPLOAD_MAX_SIZE = env.int("DJANGO_IMAGE_UPLOAD_MAX_SIZE", default=10 * 1024 * 1024)
+IMAGE_UPLOAD_MAX_DIMENSION = env.int("DJANGO_IMAGE_UPLOAD_MAX_DIMENSION", default=6000)
 
 # TEMPLATES
 # ------------------------------------------------------------------------------
@@ -257,6 +261,20 @@ LOGGING = {
 
 REDIS_URL = env("REDIS_URL", default="redis://redis:6379/0")
 REDIS_SSL = REDIS_URL.startswith("rediss://")
+# Buffer like counts in the Redis cache and write them with
+# `manage.py flush_like_counts`, needs the django-redis cache backend.
+LIKE_COUNT_BUFFERING = env.bool("DJANGO_LIKE_COUNT_BUFFERING", default=False)
+# Keep every user's favorite product ids in a Redis set, needs the
+# django-redis cache backend.
+FAVORITE_IDS_CACHE = env.bool("DJANGO_FAVORITE_IDS_CACHE", default=False)
+# "database" or "redis": keep active carts in Redis hashes and write them
+# with `manage.py flush_carts`, needs the django-redis cache backend.
+CART_STORAGE = env("DJANGO_CART_STORAGE", default="database")
+# Seconds a product stays reserved in a cart after its last change.
+RESERVATION_TIMEOUT = env.int("DJANGO_RESERVATION_TIMEOUT", default=15 * 60)
+# Threads rendering resized copies of uploaded images, see products.images.
+# 0 renders them in the request, right after the upload is committed.
+IMAGE_VARIANT_WORKERS = env.int("DJANGO_IMAGE_VARIANT_WORKERS", default=2)
 
 
 # django-rest-framework
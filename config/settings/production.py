@@ -35,6 +35,8 @@ CACHES = {
         },
     },
 }
+LIKE_COUNT_BUFFERING = env.bool("DJANGO_LIKE_COUNT_BUFFERING", default=True)
+FAVORITE_IDS_CACHE = env.bool("DJANGO_FAVORITE_IDS_CACHE", default=True)
 
 # SECURITY
 # ------------------------------------------------------------------------------
@@ -34,5 +34,7 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "http://media.testserver"
+# Render image variants in the test's thread.
+IMAGE_VARIANT_WORKERS = 0
 # Your stuff...
 # ------------------------------------------------------------------------------